@@ -0,0 +1,65 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from typing import Optional
+from app.api.v1.user.auth.routes.user import get_current_admin
+from app.utils import memory
+from app.utils.success_handler import success_response
+import anyio.to_thread
+import logging
+import os
+
+
+router = APIRouter()
+
+
+@router.post("/admin/memory/snapshot", status_code=status.HTTP_201_CREATED)
+async def take_memory_snapshot(
+    limit: int = Query(25, ge=1, le=200),
+    current_admin=Depends(get_current_admin)
+):
+    try:
+        # gc.collect() and tracemalloc snapshots walk the whole heap; keep them off the event loop.
+        snapshot = await anyio.to_thread.run_sync(memory.take_snapshot, limit)
+        return success_response(
+            message="Memory snapshot taken" if memory.tracking_enabled()
+            else "Memory snapshot taken (set SG_MEMORY_TRACKING=1 for allocation traces)",
+            data=snapshot
+        )
+
+    except Exception as e:
+        logging.error("Unexpected error in take_memory_snapshot: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/admin/memory/snapshots", status_code=status.HTTP_200_OK)
+async def list_memory_snapshots(current_admin=Depends(get_current_admin)):
+    return success_response(
+        message="Memory snapshots retrieved successfully",
+        data={"rss": memory.current_rss(), "snapshots": memory.list_snapshots()}
+    )
+
+
+@router.get("/admin/memory/diff", status_code=status.HTTP_200_OK)
+async def diff_memory_snapshots(
+    base: str,
+    target: Optional[str] = None,
+    limit: int = Query(25, ge=1, le=200),
+    current_admin=Depends(get_current_admin)
+):
+    # Snapshots are kept per worker process (see memory.take_snapshot): with
+    # several workers, the diff must reach the worker whose pid prefixes the id.
+    try:
+        diff = await anyio.to_thread.run_sync(memory.diff_snapshots, base, target, limit)
+        return success_response(message="Memory snapshots compared successfully", data=diff)
+
+    except memory.SnapshotInOtherWorker as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Snapshot {e.snapshot_id} is held by worker {e.pid}; this request reached worker {os.getpid()}, retry"
+        )
+
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Snapshot {e.args[0]} not found")
+
+    except Exception as e:
+        logging.error("Unexpected error in diff_memory_snapshots: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,58 +1,150 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
+import json
 import tempfile
 import shutil
-from typing import Optional
+import anyio.to_thread
+from typing import List, Optional
 import logging
-from app.utils.grading.engine import cfg
-from app.utils.grading.evaluation import run_evaluation
+from app.utils.error_handler import TooManyRequestsError
+from app.utils.metrics import start_timings
+from app.utils.rate_limiter import EVALUATE_PAGES_POLICY, charge
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _save_upload(upload: UploadFile) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp:
+        shutil.copyfileobj(upload.file, temp)
+        return temp.name
+
+
+def _parse_max_marks(max_marks: Optional[str]) -> Optional[List[int]]:
+    if not max_marks:
+        return None
+    try:
+        return [int(x.strip()) for x in max_marks.split(",")]
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="max_marks must be comma-separated integers like: 5,10,8"
+        )
+
+
+async def _charge_pages(request: Request, sheet_paths: List[str]):
+    """Charge the caller's page budget for the answer sheets about to be OCR'd."""
+    from app.utils.grading.ocr import pdf_page_count
+    pages = 0
+    for path in sheet_paths:
+        try:
+            pages += await anyio.to_thread.run_sync(pdf_page_count, path)
+        except Exception as e:
+            logger.warning("Could not count pages of %s for rate limiting: %s", path, e)
+            pages += 1
+    await charge(request, EVALUATE_PAGES_POLICY, pages)
+
+
+def _stream_media_type(request: Request) -> Optional[str]:
+    accept = request.headers.get("accept", "")
+    if "application/x-ndjson" in accept:
+        return "application/x-ndjson"
+    if "text/event-stream" in accept:
+        return "text/event-stream"
+    return None
+
+
+def _rounded(timings: dict) -> dict:
+    return {stage: round(seconds, 4) for stage, seconds in sorted(timings.items())}
+
+
+def _stream_evaluation(records, media_type: str, weights: dict, timings: Optional[dict] = None):
+    """Serialise evaluation records as NDJSON lines or SSE events."""
+    try:
+        for record in records:
+            if record["type"] == "summary":
+                record = {"type": "summary", "status": "success", "weights": weights, "total_score": record["total_score"]}
+                if timings is not None:
+                    record["timings"] = _rounded(timings)
+            yield _encode_record(record, media_type)
+    except Exception as e:
+        logger.exception("Evaluation error")
+        yield _encode_record({"type": "error", "detail": str(e)}, media_type)
+
+
+def _encode_record(record: dict, media_type: str) -> str:
+    payload = json.dumps(record, ensure_ascii=False)
+    if media_type == "text/event-stream":
+        return f"event: {record['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
 @router.post("/evaluate")
 async def evaluate_answer_sheet(
+    request: Request,
     schema_pdf: UploadFile = File(...),
     answer_sheet_pdf: UploadFile = File(...),
     similarity_weight: Optional[float] = Form(0.6),
     quality_weight: Optional[float] = Form(0.3),
     rubric_weight: Optional[float] = Form(0.1),
-    max_marks: Optional[str] = Form(None)
+    max_marks: Optional[str] = Form(None),
+    assessment_id: Optional[str] = Form(None),
+    submission_id: Optional[str] = Form(None),
+    include_timings: Optional[bool] = Form(False)
 ):
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as schema_temp:
-            shutil.copyfileobj(schema_pdf.file, schema_temp)
-            schema_path = schema_temp.name
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as student_temp:
-            shutil.copyfileobj(answer_sheet_pdf.file, student_temp)
-            student_path = student_temp.name
-
-        if max_marks:
-            try:
-                max_marks_list = [int(x.strip()) for x in max_marks.split(",")]
-            except ValueError:
-                raise HTTPException(
-                    status_code=400,
-                    detail="max_marks must be comma-separated integers like: 5,10,8"
-                )
-        else:
-            max_marks_list = None
-
-        cfg["weights"] = {
+        schema_path = _save_upload(schema_pdf)
+        student_path = _save_upload(answer_sheet_pdf)
+        max_marks_list = _parse_max_marks(max_marks)
+        await _charge_pages(request, [student_path])
+
+        # Passed down explicitly: concurrent requests must not share weights through cfg.
+        weights = {
             "similarity": similarity_weight,
             "quality": quality_weight,
             "rubric": rubric_weight,
         }
 
-        result = run_evaluation(schema_path, student_path, max_marks_list)
+        # Imported on first use so auth-only workers never load the grading stack.
+        from app.utils.grading.evaluation import iter_evaluation, run_evaluation
+
+        # Worker threads inherit this request's context, so every stage they
+        # run is added to the breakdown.
+        timings = start_timings()
+
+        media_type = _stream_media_type(request)
+        if media_type:
+            # Starlette iterates this sync generator in a worker thread, sending
+            # each question's record as soon as it is scored.
+            records = iter_evaluation(
+                schema_path, student_path, max_marks_list,
+                assessment_id, submission_id or answer_sheet_pdf.filename, weights
+            )
+            return StreamingResponse(
+                _stream_evaluation(records, media_type, weights, timings if include_timings else None),
+                media_type=media_type,
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
 
-        return {
+        # Grading is CPU/IO bound; run it off the event loop so concurrent
+        # evaluations can share encoder batches.
+        result = await anyio.to_thread.run_sync(
+            run_evaluation, schema_path, student_path, max_marks_list,
+            assessment_id, submission_id or answer_sheet_pdf.filename, weights
+        )
+
+        response = {
             "status": "success",
-            "weights": cfg["weights"],
+            "weights": weights,
             "result": result,
         }
+        if include_timings:
+            response["timings"] = _rounded(timings)
+        return response
+
+    except (HTTPException, TooManyRequestsError):
+        raise
 
     except Exception as e:
         logger.exception("Evaluation error")
@@ -61,3 +153,63 @@ async def evaluate_answer_sheet(
     finally:
         schema_pdf.file.close()
         answer_sheet_pdf.file.close()
+
+
+@router.post("/evaluate/cohort")
+async def evaluate_cohort(
+    request: Request,
+    schema_pdf: UploadFile = File(...),
+    answer_sheet_pdfs: List[UploadFile] = File(...),
+    similarity_weight: Optional[float] = Form(0.6),
+    quality_weight: Optional[float] = Form(0.3),
+    rubric_weight: Optional[float] = Form(0.1),
+    max_marks: Optional[str] = Form(None),
+    check_collusion: Optional[bool] = Form(False),
+    assessment_id: Optional[str] = Form(None)
+):
+    try:
+        schema_path = _save_upload(schema_pdf)
+        student_paths = [_save_upload(pdf) for pdf in answer_sheet_pdfs]
+        max_marks_list = _parse_max_marks(max_marks)
+        await _charge_pages(request, student_paths)
+
+        weights = {
+            "similarity": similarity_weight,
+            "quality": quality_weight,
+            "rubric": rubric_weight,
+        }
+
+        from app.utils.grading.evaluation import run_cohort_evaluation
+
+        filenames = [pdf.filename for pdf in answer_sheet_pdfs]
+        evaluation = await anyio.to_thread.run_sync(
+            run_cohort_evaluation, schema_path, student_paths, max_marks_list, check_collusion,
+            assessment_id, filenames, weights
+        )
+
+        response = {
+            "status": "success",
+            "weights": weights,
+            "results": [
+                {"answer_sheet": filename, "result": result}
+                for filename, result in zip(filenames, evaluation["results"])
+            ],
+        }
+        if "collusion" in evaluation:
+            response["collusion"] = [
+                {**pair, "student_a": filenames[pair["student_a"]], "student_b": filenames[pair["student_b"]]}
+                for pair in evaluation["collusion"]
+            ]
+        return response
+
+    except (HTTPException, TooManyRequestsError):
+        raise
+
+    except Exception as e:
+        logger.exception("Cohort evaluation error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    finally:
+        schema_pdf.file.close()
+        for pdf in answer_sheet_pdfs:
+            pdf.file.close()
@@ -1,5 +1,4 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from passlib.context import CryptContext
 from app.db.prisma_client import get_prisma
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict
@@ -7,7 +6,10 @@ from jose import jwt, JWTError, ExpiredSignatureError
 from app.api.v1.user.auth.models.user import Register, OTPVerify, Login, ResetPassword, EmailOnlyRequest
 from app.api.v1.user.auth.mails.templates import sign_up_template, forgot_password_template
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.utils.mail_handler import send_mail
+from app.utils.mail_handler import enqueue_mail
+from app.utils.password_hasher import hash_password, verify_password, verify_and_update
+from app.redis.principal_cache import principal_cache, invalidate_principal
+from app.redis import otp_store
 from app.utils.success_handler import success_response
 from prisma import Prisma
 from prisma.enums import Role
@@ -30,13 +32,6 @@ def create_access_token(data: Dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
 
 
 router = APIRouter()
@@ -58,8 +53,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(b
         if not email or not user_id:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token claims")
 
-        user = await prisma.user.find_first(where={"email": email, "id": user_id, "is_deleted": False})
-        if not user:
+        # Served from the principal cache; Postgres is only hit on a miss.
+        user = await principal_cache.get(prisma, user_id)
+        if not user or user.email != email:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
         return user
 
@@ -78,28 +74,37 @@ async def get_current_admin(current_user=Depends(get_current_user)):
     return current_user
 
 
+async def _store_rehash(prisma: Prisma, user_id: str, new_hash: str):
+    # Best effort: the login already succeeded, so a failed upgrade only means
+    # the old hash is checked (and upgraded) again next time.
+    try:
+        await prisma.user.update(where={"id": user_id}, data={"hashed_password": new_hash})
+        await invalidate_principal(user_id)
+    except Exception as e:
+        logging.warning("Failed to store upgraded password hash for %s: %s", user_id, e)
+
+
 # APIs
 @router.post("/register", status_code=201)
 async def register(request: Register, prisma: Prisma = Depends(get_prisma)):
     try:
-        async with prisma.tx(timeout=65000, max_wait=80000) as tx:
-            existing = await tx.user.find_first(where={"email": request.email})
-            if existing:
-                if not existing.is_deleted:
-                    raise HTTPException(400, "User already registered")
-                raise HTTPException(409, "Account deleted. Restore?")
-
-            await tx.otpsession.delete_many(where={"email": request.email, "type": "signup"})
-            otp = str(random.randint(100000, 999999))
-            session = await tx.otpsession.create(data={
-                "name": request.name,
-                "email": request.email,
-                "hashed_password": get_password_hash(request.password),
-                "otp": otp,
-                "type": "signup"
-            })
-            await send_mail([request.email], "SmartGrader: Verify Your Account", sign_up_template(otp))
-            return success_response("OTP sent", {"session_id": session.session_id})
+        existing = await prisma.user.find_first(where={"email": request.email})
+        if existing:
+            if not existing.is_deleted:
+                raise HTTPException(400, "User already registered")
+            raise HTTPException(409, "Account deleted. Restore?")
+
+        otp = str(random.randint(100000, 999999))
+        session_id = await otp_store.create_session(
+            email=request.email,
+            otp=otp,
+            session_type="signup",
+            name=request.name,
+            hashed_password=await hash_password(request.password),
+        )
+
+        await enqueue_mail([request.email], "SmartGrader: Verify Your Account", sign_up_template(otp))
+        return success_response("OTP sent", {"session_id": session_id})
 
     except HTTPException as he:
         logging.error("HTTPException: %s", he)
@@ -113,23 +118,25 @@ async def register(request: Register, prisma: Prisma = Depends(get_prisma)):
 @router.put("/verify/otp")
 async def verify_otp(request: OTPVerify, prisma: Prisma = Depends(get_prisma)):
     try:
-        async with prisma.tx(timeout=65000, max_wait=80000) as tx:
-            session = await tx.otpsession.find_first(where={"session_id": request.session_id})
-            if not session or session.otp != request.otp:
-                raise HTTPException(400, "Invalid session or OTP")
-
-            existing = await tx.user.find_first(where={"email": session.email})
-            if existing:
-                raise HTTPException(409 if existing.is_deleted else 400, "User exists or deleted")
-
-            await tx.user.create(data={
-                "name": session.name,
-                "email": session.email,
-                "hashed_password": session.hashed_password,
-                "is_email_verified": True
-            })
-            await tx.otpsession.delete_many(where={"session_id": session.session_id})
-            return success_response("OTP verified")
+        # Consumed atomically, so the same OTP cannot create the account twice.
+        # Only signup sessions are consumed; any other kind is left intact.
+        result, session = await otp_store.consume_session(request.session_id, request.otp, "signup")
+        if result == "locked":
+            raise HTTPException(400, "Too many incorrect OTP attempts, please register again")
+        if not session:
+            raise HTTPException(400, "Invalid session or OTP")
+
+        existing = await prisma.user.find_first(where={"email": session["email"]})
+        if existing:
+            raise HTTPException(409 if existing.is_deleted else 400, "User exists or deleted")
+
+        await prisma.user.create(data={
+            "name": session.get("name"),
+            "email": session["email"],
+            "hashed_password": session.get("hashed_password"),
+            "is_email_verified": True
+        })
+        return success_response("OTP verified")
 
     except HTTPException as he:
         logging.error("HTTPException: %s", he)
@@ -143,15 +150,13 @@ async def verify_otp(request: OTPVerify, prisma: Prisma = Depends(get_prisma)):
 @router.post("/resend-otp")
 async def resend_otp(session_id: str, prisma: Prisma = Depends(get_prisma)):
     try:
-        async with prisma.tx(timeout=65000, max_wait=80000) as tx:
-            session = await tx.otpsession.find_first(where={"session_id": session_id})
-            if not session:
-                raise HTTPException(400, "Session not found")
+        session = await otp_store.get_session(session_id)
+        otp = str(random.randint(100000, 999999))
+        if not session or not await otp_store.refresh_otp(session_id, otp):
+            raise HTTPException(400, "Session not found")
 
-            otp = str(random.randint(100000, 999999))
-            await tx.otpsession.update(where={"session_id": session_id}, data={"otp": otp})
-            await send_mail([session.email], "SmartGrader: Verify Your Account", sign_up_template(otp))
-            return success_response("OTP resent", {"session_id": session_id})
+        await enqueue_mail([session["email"]], "SmartGrader: Verify Your Account", sign_up_template(otp))
+        return success_response("OTP resent", {"session_id": session_id})
 
     except HTTPException as he:
         logging.error("HTTPException: %s", he)
@@ -168,10 +173,13 @@ async def login(request: Login, prisma: Prisma = Depends(get_prisma)):
         user = await prisma.user.find_first(where={"email": request.email})
         if not user:
             raise HTTPException(404, "User not registered")
-        if not verify_password(request.password, user.hashed_password):
+        valid, new_hash = await verify_and_update(request.password, user.hashed_password)
+        if not valid:
             raise HTTPException(400, "Incorrect password")
         if user.is_deleted:
             raise HTTPException(409, "Account is soft-deleted")
+        if new_hash:
+            await _store_rehash(prisma, user.id, new_hash)
 
         token = create_access_token({"id": user.id, "email": user.email})
         return success_response("Login successful", {"access_token": token})
@@ -216,16 +224,15 @@ async def refresh_token(credentials: HTTPAuthorizationCredentials = Depends(bear
 @router.post("/forgot-password/{email}")
 async def forgot_password(email: str, prisma: Prisma = Depends(get_prisma)):
     try:
-        async with prisma.tx(timeout=65000, max_wait=80000) as tx:
-            user = await tx.user.find_first(where={"email": email})
-            if not user:
-                raise HTTPException(404, "User not found")
+        user = await prisma.user.find_first(where={"email": email})
+        if not user:
+            raise HTTPException(404, "User not found")
+
+        otp = str(random.randint(100000, 999999))
+        session_id = await otp_store.create_session(email=email, otp=otp, session_type="password_reset")
 
-            await tx.otpsession.delete_many(where={"email": email, "type": "password_reset"})
-            otp = str(random.randint(100000, 999999))
-            session = await tx.otpsession.create(data={"email": email, "otp": otp, "type": "password_reset", "hashed_password": user.hashed_password})
-            await send_mail([email], "SmartGrader: Password Reset", forgot_password_template(otp))
-            return success_response("OTP sent", {"session_id": session.session_id})
+        await enqueue_mail([email], "SmartGrader: Password Reset", forgot_password_template(otp))
+        return success_response("OTP sent", {"session_id": session_id})
 
     except HTTPException as he:
         logging.error("HTTPException: %s", he)
@@ -239,14 +246,18 @@ async def forgot_password(email: str, prisma: Prisma = Depends(get_prisma)):
 @router.post("/reset-password")
 async def reset_password(request: ResetPassword, prisma: Prisma = Depends(get_prisma)):
     try:
-        async with prisma.tx(timeout=65000, max_wait=80000) as tx:
-            session = await tx.otpsession.find_first(where={"email": request.email})
-            if not session or session.otp != request.otp:
-                raise HTTPException(400, "Invalid OTP")
+        result, session = await otp_store.consume_session_by_email("password_reset", request.email, request.otp)
+        if result == "locked":
+            raise HTTPException(400, "Too many incorrect OTP attempts, please request a new OTP")
+        if not session:
+            raise HTTPException(400, "Invalid OTP")
+
+        hashed_password = await hash_password(request.new_password)
+        user = await prisma.user.update(where={"email": request.email}, data={"hashed_password": hashed_password})
 
-            await tx.user.update(where={"email": request.email}, data={"hashed_password": get_password_hash(request.new_password)})
-            await tx.otpsession.delete_many(where={"email": request.email, "type": "password_reset"})
-            return success_response("Password reset successful")
+        if user:
+            await invalidate_principal(user.id)
+        return success_response("Password reset successful")
 
     except HTTPException as he:
         logging.error("HTTPException: %s", he)
@@ -265,10 +276,11 @@ async def restore_account(request: Login, prisma: Prisma = Depends(get_prisma)):
             raise HTTPException(404, "User not found")
         if not user.is_deleted:
             raise HTTPException(400, "Account already active")
-        if not verify_password(request.password, user.hashed_password):
+        if not await verify_password(request.password, user.hashed_password):
             raise HTTPException(400, "Incorrect password")
 
         await prisma.user.update(where={"id": user.id}, data={"is_deleted": False})
+        await invalidate_principal(user.id)
         token = create_access_token({"id": user.id, "email": user.email})
         return success_response("Account restored", {"access_token": token})
 
@@ -291,6 +303,7 @@ async def restore_account_google(request: EmailOnlyRequest, prisma: Prisma = Dep
             raise HTTPException(400, "Account already active")
 
         await prisma.user.update(where={"id": user.id}, data={"is_deleted": False, "is_google_verified": True})
+        await invalidate_principal(user.id)
         token = create_access_token({"id": user.id, "email": user.email})
         return success_response("Account restored", {"access_token": token})
 
@@ -1,57 +1,26 @@
 from fastapi import APIRouter, HTTPException, Depends, status, File, UploadFile
 from typing import Optional
 from app.db.prisma_client import get_prisma
-from app.redis.redis_client import redis_handler
+from app.redis.principal_cache import invalidate_principal
 from app.cloud.aws.storage import upload_file_to_s3, delete_file_from_s3
 from app.utils.success_handler import success_response
 from app.api.v1.user.auth.routes.user import get_current_user
 from prisma import Prisma
 from prisma.enums import Role
 from env import env
-import logging, json
+import logging
 
 
 router = APIRouter()
 
 
 @router.get("/user", status_code=status.HTTP_200_OK)
-async def get_user_info(
-    prisma: Prisma = Depends(get_prisma),
-    current_user=Depends(get_current_user)
-):
-    try:
-        cache_key = f"user_info_{current_user.id}"
-        redis_client = await redis_handler.get_client()
-        cached_user = await redis_client.get(cache_key)
-
-        if cached_user:
-            return success_response(
-                message="User information retrieved from cache",
-                data=json.loads(cached_user)
-            )
-
-        user = await prisma.user.find_first(
-            where={"id": current_user.id, "is_deleted": False}
-        )
-
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        user_dict = user.model_dump(mode='json')
-        await redis_client.setex(cache_key, 3600, json.dumps(user_dict))
-
-        return success_response(
-            message="User information retrieved successfully",
-            data=user
-        )
-
-    except HTTPException as he:
-        logging.error("HTTPException in get_user_info: %s", he)
-        raise
-
-    except Exception as e:
-        logging.error("Unexpected error in get_user_info: %s", e, exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_user_info(current_user=Depends(get_current_user)):
+    # get_current_user already resolved the user through the principal cache.
+    return success_response(
+        message="User information retrieved successfully",
+        data=current_user
+    )
 
 
 @router.put("/user", status_code=status.HTTP_200_OK)
@@ -119,8 +88,7 @@ async def update_user(
                 data=data
             )
 
-            redis_client = await redis_handler.get_client()
-            await redis_client.delete(f"user_info_{current_user.id}")
+        await invalidate_principal(current_user.id)
 
         return success_response(
             message="User updated successfully",
@@ -148,8 +116,7 @@ async def delete_user(
                 data={"is_deleted": True}
             )
 
-            redis_client = await redis_handler.get_client()
-            await redis_client.delete(f"user_info_{current_user.id}")
+        await invalidate_principal(current_user.id)
 
         return success_response(message="User deleted successfully")
 
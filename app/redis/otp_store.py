@@ -0,0 +1,193 @@
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+from app.redis.redis_client import redis_handler
+
+
+# One hash per OTP session, plus an index from (type, email) to the current
+# session so a new signup or reset replaces the previous one. Both expire on
+# their own, so abandoned sessions need no cleanup.
+#
+#   otp:session:<session_id>    hash: otp, name, email, hashed_password, type, attempts, created_at
+#   otp:email:<type>:<email>    session_id
+OTP_TTL_SECONDS = 900
+OTP_MAX_ATTEMPTS = 5
+
+SESSION_PREFIX = "otp:session:"
+EMAIL_INDEX_PREFIX = "otp:email:"
+
+# Every key a script touches is passed in KEYS, so the index entry and the
+# previous session are looked up by the caller first.
+
+# KEYS: new session, email index[, previous session]. ARGV: ttl, previous
+# session id ('' if none), then field/value pairs. Returns 0 without writing
+# if the index moved on since the caller read it.
+_CREATE = """
+local current = redis.call('GET', KEYS[2]) or ''
+if current ~= ARGV[2] then
+    return 0
+end
+if KEYS[3] then
+    redis.call('DEL', KEYS[3])
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('SET', KEYS[2], redis.call('HGET', KEYS[1], 'session_id'), 'EX', ARGV[1])
+return 1
+"""
+
+# KEYS: session, email index. ARGV: new otp, ttl.
+_REFRESH = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'otp', ARGV[1], 'attempts', 0)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+if redis.call('GET', KEYS[2]) == redis.call('HGET', KEYS[1], 'session_id') then
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+# KEYS: session, email index. ARGV: otp, max attempts, expected type ('' for any).
+# Returns {status, field, value, ...}; the session is deleted on success and
+# once the attempts run out, and left untouched if it has another type.
+_CONSUME = """
+local session = redis.call('HGETALL', KEYS[1])
+if #session == 0 then
+    return {'missing'}
+end
+local fields = {}
+for i = 1, #session, 2 do
+    fields[session[i]] = session[i + 1]
+end
+if ARGV[3] ~= '' and fields['type'] ~= ARGV[3] then
+    return {'wrong_type'}
+end
+if fields['otp'] ~= ARGV[1] then
+    local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+    if attempts < tonumber(ARGV[2]) then
+        return {'mismatch'}
+    end
+    redis.call('DEL', KEYS[1])
+    if redis.call('GET', KEYS[2]) == fields['session_id'] then
+        redis.call('DEL', KEYS[2])
+    end
+    return {'locked'}
+end
+redis.call('DEL', KEYS[1])
+if redis.call('GET', KEYS[2]) == fields['session_id'] then
+    redis.call('DEL', KEYS[2])
+end
+local result = {'ok'}
+for i = 1, #session do
+    result[#result + 1] = session[i]
+end
+return result
+"""
+
+# Attempts at replacing a session while concurrent requests for the same
+# email keep moving the index.
+_CREATE_RETRIES = 5
+
+
+class OtpStoreUnavailable(Exception):
+    pass
+
+
+def _session_key(session_id: str) -> str:
+    return SESSION_PREFIX + session_id
+
+
+def _email_index_key(session_type: str, email: str) -> str:
+    return f"{EMAIL_INDEX_PREFIX}{session_type}:{email}"
+
+
+async def _client():
+    redis_client = await redis_handler.get_client()
+    if redis_client is None:
+        raise OtpStoreUnavailable("OTP store unavailable: no Redis connection")
+    return redis_client
+
+
+async def _index_key_for(redis_client, session_key: str) -> Optional[str]:
+    """The email index key of an existing session, or None if it is gone."""
+    session_type, email = await redis_client.hmget(session_key, "type", "email")
+    if session_type is None or email is None:
+        return None
+    return _email_index_key(session_type, email)
+
+
+async def create_session(email: str, otp: str, session_type: str, name: Optional[str] = None,
+                         hashed_password: Optional[str] = None) -> str:
+    """Start an OTP session, replacing any earlier one of the same type for this email."""
+    redis_client = await _client()
+    session_id = str(uuid.uuid4())
+    fields = {
+        "session_id": session_id,
+        "otp": otp,
+        "email": email,
+        "type": session_type,
+        "attempts": 0,
+        "created_at": int(time.time()),
+    }
+    if name is not None:
+        fields["name"] = name
+    if hashed_password is not None:
+        fields["hashed_password"] = hashed_password
+    pairs = [item for field, value in fields.items() for item in (field, value)]
+    index_key = _email_index_key(session_type, email)
+    for _ in range(_CREATE_RETRIES):
+        previous = await redis_client.get(index_key) or ""
+        keys = [_session_key(session_id), index_key] + ([_session_key(previous)] if previous else [])
+        if await redis_client.eval(_CREATE, len(keys), *keys, OTP_TTL_SECONDS, previous, *pairs):
+            return session_id
+    raise OtpStoreUnavailable(f"OTP store busy: could not replace the {session_type} session for {email}")
+
+
+async def get_session(session_id: str) -> Optional[Dict[str, str]]:
+    redis_client = await _client()
+    session = await redis_client.hgetall(_session_key(session_id))
+    return session or None
+
+
+async def refresh_otp(session_id: str, otp: str) -> bool:
+    """Replace the OTP, reset the attempt counter and restart the TTL. False if the session is gone."""
+    redis_client = await _client()
+    session_key = _session_key(session_id)
+    index_key = await _index_key_for(redis_client, session_key)
+    if index_key is None:
+        return False
+    return bool(await redis_client.eval(_REFRESH, 2, session_key, index_key, otp, OTP_TTL_SECONDS))
+
+
+async def consume_session(session_id: str, otp: str,
+                          session_type: Optional[str] = None) -> Tuple[str, Optional[Dict[str, str]]]:
+    """
+    Check `otp` against the session and delete the session if it matches, in
+    one step, so an OTP can only be used once. Returns (status, session) where
+    status is "ok", "missing", "wrong_type" (the session is not of
+    `session_type` and was left as it is), "mismatch" or "locked" (too many
+    wrong OTPs; the session has been deleted) and session is only set for "ok".
+    """
+    redis_client = await _client()
+    session_key = _session_key(session_id)
+    index_key = await _index_key_for(redis_client, session_key)
+    if index_key is None:
+        return "missing", None
+    result = await redis_client.eval(
+        _CONSUME, 2, session_key, index_key, otp, OTP_MAX_ATTEMPTS, session_type or "",
+    )
+    status, values = result[0], result[1:]
+    if status != "ok":
+        return status, None
+    return status, dict(zip(values[::2], values[1::2]))
+
+
+async def consume_session_by_email(session_type: str, email: str, otp: str) -> Tuple[str, Optional[Dict[str, str]]]:
+    """`consume_session` for the current session of this type for `email`."""
+    redis_client = await _client()
+    session_id = await redis_client.get(_email_index_key(session_type, email))
+    if not session_id:
+        return "missing", None
+    return await consume_session(session_id, otp, session_type)
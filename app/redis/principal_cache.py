@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from prisma import Prisma
+from prisma.models import User
+from app.redis.redis_client import redis_handler
+from app.utils.metrics import record_cache
+from app.utils.tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TTL_SECONDS = 30
+LOCAL_MAX_ENTRIES = 10000
+REDIS_TTL_SECONDS = 300
+GENERATION_TTL_SECONDS = 86400
+INVALIDATION_CHANNEL = "principal_invalidate"
+
+# KEYS: entry, generation. ARGV: generation seen before the DB read ('' if
+# none), value, ttl. Skips the write if the user was invalidated meanwhile.
+_SET_IF_CURRENT = """
+local current = redis.call('GET', KEYS[2]) or ''
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+def principal_key(user_id: str) -> str:
+    # Same key the /user endpoint has always cached the user under.
+    return f"user_info_{user_id}"
+
+
+def generation_key(user_id: str) -> str:
+    return f"principal_gen_{user_id}"
+
+
+class PrincipalCache:
+    """
+    Two-tier cache of authenticated users, keyed by user id.
+
+    Tier 1 is a per-process LRU with a short TTL and tier 2 is Redis
+    (`user_info_{id}`). Invalidation bumps the user's generation counter,
+    deletes the Redis key and publishes the id so every worker drops its
+    local copy; the local TTL bounds staleness if a message is missed.
+    A row read from Postgres is only cached if no invalidation happened
+    since the read started, so a slow reader cannot re-cache a deleted or
+    changed user. Redis errors fall back to Postgres.
+    """
+
+    def __init__(self, ttl: float = LOCAL_TTL_SECONDS, max_entries: int = LOCAL_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        # Bumped on every local eviction; a fetch that spans one is not cached locally.
+        self._epoch = 0
+        self._listener: Optional[asyncio.Task] = None
+
+    def _get_local(self, user_id: str) -> Optional[User]:
+        entry = self._local.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self._local.pop(user_id, None)
+            return None
+        self._local.move_to_end(user_id)
+        return user
+
+    def _set_local(self, user: User):
+        self._local[user.id] = (time.monotonic() + self.ttl, user)
+        self._local.move_to_end(user.id)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def evict_local(self, user_id: str):
+        self._epoch += 1
+        self._local.pop(user_id, None)
+
+    def clear_local(self):
+        self._epoch += 1
+        self._local.clear()
+
+    async def _get_redis(self, user_id: str) -> Tuple[Optional[User], Optional[str]]:
+        """The cached user (if any) and the generation to guard a later write with."""
+        try:
+            redis_client = await redis_handler.get_client()
+            if redis_client is None:
+                return None, None
+            with span("redis.get", key=principal_key(user_id)):
+                cached, generation = await redis_client.mget(principal_key(user_id), generation_key(user_id))
+            user = User.model_validate(json.loads(cached)) if cached else None
+            return user, generation or ""
+        except Exception as e:
+            logger.warning("Principal cache read failed for %s: %s", user_id, e)
+            return None, None
+
+    async def _set_redis(self, user: User, generation: str):
+        try:
+            redis_client = await redis_handler.get_client()
+            if redis_client is not None:
+                await redis_client.eval(
+                    _SET_IF_CURRENT, 2, principal_key(user.id), generation_key(user.id),
+                    generation, user.model_dump_json(), REDIS_TTL_SECONDS,
+                )
+        except Exception as e:
+            logger.warning("Principal cache write failed for %s: %s", user.id, e)
+
+    async def get(self, prisma: Prisma, user_id: str) -> Optional[User]:
+        """The active (not deleted) user with this id, or None."""
+        user = self._get_local(user_id)
+        record_cache("principal_local", hit=user is not None)
+        if user is not None:
+            return user
+
+        epoch = self._epoch
+        user, generation = await self._get_redis(user_id)
+        record_cache("principal_redis", hit=user is not None)
+        if user is None:
+            with span("db.user.find_first"):
+                user = await prisma.user.find_first(where={"id": user_id, "is_deleted": False})
+            if user is None:
+                return None
+            # Without a generation (Redis unavailable) nothing is cached in Redis.
+            if generation is not None:
+                await self._set_redis(user, generation)
+        if user.is_deleted:
+            return None
+        if epoch == self._epoch:
+            self._set_local(user)
+        return user
+
+    async def invalidate(self, user_id: str):
+        self.evict_local(user_id)
+        try:
+            redis_client = await redis_handler.get_client()
+            if redis_client is None:
+                return
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.incr(generation_key(user_id))
+                pipe.expire(generation_key(user_id), GENERATION_TTL_SECONDS)
+                pipe.delete(principal_key(user_id))
+                await pipe.execute()
+            await redis_client.publish(INVALIDATION_CHANNEL, user_id)
+        except Exception as e:
+            logger.error("Failed to invalidate principal %s: %s", user_id, e)
+
+    async def _listen(self):
+        while True:
+            pubsub = None
+            try:
+                redis_client = await redis_handler.get_client()
+                if redis_client is None:
+                    await asyncio.sleep(5)
+                    continue
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything cached before (re)subscribing may have missed a message.
+                self.clear_local()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.evict_local(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Principal invalidation listener error, resubscribing: %s", e)
+                self.clear_local()
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    def start(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+principal_cache = PrincipalCache()
+
+
+async def invalidate_principal(user_id: str):
+    """Drop a user from every cache tier in every worker. Call after the change is committed."""
+    await principal_cache.invalidate(user_id)
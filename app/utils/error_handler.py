@@ -1,6 +1,8 @@
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
+from typing import Optional
+import math
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 class ErrorHandler(Exception):
@@ -17,8 +19,17 @@ class UnprocessableEntityError(ErrorHandler):
         super().__init__(message, status.HTTP_422_UNPROCESSABLE_ENTITY)
 
 class TooManyRequestsError(ErrorHandler):
-    def __init__(self, message: str = "Too Many Requests"):
+    def __init__(self, message: str = "Too Many Requests", retry_after: Optional[float] = None):
         super().__init__(message, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.retry_after = retry_after
+
+def too_many_requests_response(exc: TooManyRequestsError) -> JSONResponse:
+    headers = {"Retry-After": str(max(1, math.ceil(exc.retry_after)))} if exc.retry_after is not None else None
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"success": False, "message": exc.message},
+        headers=headers,
+    )
 
 def setup_error_handlers(app):
     @app.exception_handler(StarletteHTTPException)
@@ -26,6 +37,7 @@ def setup_error_handlers(app):
         return JSONResponse(
             status_code=exc.status_code,
             content={"success": False, "message": str(exc.detail)},
+            headers=getattr(exc, "headers", None),
         )
 
     @app.exception_handler(RequestValidationError)
@@ -74,7 +86,4 @@ def setup_error_handlers(app):
 
     @app.exception_handler(TooManyRequestsError)
     async def too_many_requests_handler(request: Request, exc: TooManyRequestsError):
-        return JSONResponse(
-            status_code=exc.status_code,
-            content={"success": False, "message": exc.message},
-        )
\ No newline at end of file
+        return too_many_requests_response(exc)
\ No newline at end of file
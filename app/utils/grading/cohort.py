@@ -0,0 +1,135 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from .logger import get_logger
+from .quality import quality_score
+from .rubric import apply_rubric_to_answer
+from .semantic import batch_similarity
+from app.utils.metrics import FALLBACKS, stage_timer
+
+
+logger = get_logger(__name__)
+
+
+SIMILARITY_FEEDBACK = np.array([
+    "Answer differs substantially from expected answer.",
+    "Answer partially matches expected answer.",
+    "Answer closely matches expected answer.",
+], dtype=object)
+SIMILARITY_THRESHOLDS = np.array([0.4, 0.7], dtype=np.float32)
+
+QUALITY_FEEDBACK = np.array([
+    "Poor clarity/grammar detected.",
+    "Good clarity and coherence.",
+], dtype=object)
+QUALITY_THRESHOLDS = np.array([0.5], dtype=np.float32)
+
+
+class CohortScores:
+    """
+    Component and final scores for N students x Q questions, held as dense
+    (N, Q) float32 arrays. Per-student result dicts are only built by
+    `to_results`, at the API boundary.
+    """
+
+    def __init__(self, question_ids: List[int], answers: List[List[str]], similarity: np.ndarray,
+                 quality: np.ndarray, rubric: np.ndarray, max_marks: np.ndarray, weights: Dict[str, float],
+                 embeddings: np.ndarray = None):
+        self.question_ids = question_ids
+        self.answers = answers
+        # (N, Q, D) L2-normalised student answer embeddings, zero for empty answers.
+        self.embeddings = embeddings
+        self.similarity = np.clip(similarity.astype(np.float32, copy=False), 0.0, 1.0)
+        self.quality = np.clip(quality.astype(np.float32, copy=False), 0.0, 1.0)
+        self.rubric = rubric.astype(np.float32, copy=False)
+        self.max_marks = max_marks.astype(np.float32, copy=False)
+        self.final = combine_scores(self.similarity, self.quality, self.rubric, self.max_marks, weights)
+
+    @property
+    def totals(self) -> np.ndarray:
+        return self.final.sum(axis=1, dtype=np.float64)
+
+    def feedback(self) -> np.ndarray:
+        sim_bucket = np.digitize(self.similarity, SIMILARITY_THRESHOLDS)
+        qual_bucket = np.digitize(self.quality, QUALITY_THRESHOLDS)
+        return SIMILARITY_FEEDBACK[sim_bucket] + " " + QUALITY_FEEDBACK[qual_bucket]
+
+    def to_results(self) -> List[Dict[str, Any]]:
+        feedback = self.feedback()
+        similarity = np.round(self.similarity.astype(np.float64), 4).tolist()
+        quality = np.round(self.quality.astype(np.float64), 4).tolist()
+        rubric = np.round(self.rubric.astype(np.float64), 4).tolist()
+        final = np.round(self.final.astype(np.float64), 4).tolist()
+        max_marks = self.max_marks.astype(np.float64).tolist()
+        totals = np.round(self.totals, 4).tolist()
+
+        results = []
+        for n, answers in enumerate(self.answers):
+            results.append({
+                "questions": [
+                    {
+                        "question_id": qid,
+                        "student_answer": answers[j],
+                        "similarity_score": similarity[n][j],
+                        "quality_score": quality[n][j],
+                        "rubric_score": rubric[n][j],
+                        "final_marks": final[n][j],
+                        "max_marks": max_marks[j],
+                        "feedback": feedback[n, j],
+                    }
+                    for j, qid in enumerate(self.question_ids)
+                ],
+                "total_score": totals[n],
+            })
+        return results
+
+
+def combine_scores(similarity: np.ndarray, quality: np.ndarray, rubric: np.ndarray,
+                   max_marks: np.ndarray, weights: Dict[str, float]) -> np.ndarray:
+    """Weighted combination of normalised component scores, scaled to each question's marks."""
+    safe_max = np.where(max_marks > 0, max_marks, 1.0).astype(np.float32)
+    rubric_norm = np.where(max_marks > 0, rubric / safe_max, 0.0).astype(np.float32)
+    combined = (
+        np.float32(weights["similarity"]) * similarity +
+        np.float32(weights["quality"]) * quality +
+        np.float32(weights["rubric"]) * rubric_norm
+    )
+    return np.clip(combined, 0.0, 1.0) * max_marks
+
+
+def _similarity_matrix(answers: List[List[str]], model_row: List[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    n, q = len(answers), len(model_row)
+    try:
+        flat, embeddings = batch_similarity(model_row * n, [a for row in answers for a in row], return_embeddings=True)
+        return np.asarray(flat, dtype=np.float32).reshape(n, q), embeddings.reshape(n, q, embeddings.shape[1])
+    except Exception:
+        logger.exception("Semantic similarity failed; scoring similarity as 0.0")
+        FALLBACKS.labels("similarity", "error").inc()
+        return np.zeros((n, q), dtype=np.float32), None
+
+
+@stage_timer("rubric")
+def assemble_scores(questions: List[Dict[str, Any]], answers: List[List[str]], similarity: np.ndarray,
+                    quality: np.ndarray, weights: Dict[str, float], embeddings: np.ndarray = None) -> CohortScores:
+    """Add rubric scores to precomputed similarity/quality matrices and combine them."""
+    question_ids = [q.get("question_id") for q in questions]
+    rubric = np.zeros((len(answers), len(questions)), dtype=np.float32)
+    for i, row in enumerate(answers):
+        for j, (answer, q) in enumerate(zip(row, questions)):
+            rubric[i, j] = apply_rubric_to_answer(answer, q)
+
+    max_marks = np.array([float(q.get("max_marks", 0)) for q in questions], dtype=np.float32)
+    return CohortScores(question_ids, answers, similarity, quality, rubric, max_marks, weights, embeddings)
+
+
+def score_cohort(cohort_answers: List[Dict[int, str]], model_answers: Dict[int, str],
+                 questions: List[Dict[str, Any]], weights: Dict[str, float]) -> CohortScores:
+    question_ids = [q.get("question_id") for q in questions]
+    answers = [[student.get(qid, "") for qid in question_ids] for student in cohort_answers]
+
+    similarity, embeddings = _similarity_matrix(answers, [model_answers.get(qid, "") for qid in question_ids])
+    quality = np.zeros((len(answers), len(question_ids)), dtype=np.float32)
+    for i, row in enumerate(answers):
+        for j, answer in enumerate(row):
+            quality[i, j] = quality_score(answer, max_score=1.0)
+
+    return assemble_scores(questions, answers, similarity, quality, weights, embeddings)
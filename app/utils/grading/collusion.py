@@ -0,0 +1,62 @@
+import numpy as np
+from typing import Any, Dict, List, Sequence, Tuple
+from .config import cfg
+from .logger import get_logger
+from app.utils.metrics import stage_timer
+
+
+logger = get_logger(__name__)
+
+
+def similar_pairs(embeddings: np.ndarray, threshold: float, block_size: int = 256) -> List[Tuple[int, int, float]]:
+    """
+    All pairs (i, j), i < j, of rows of an L2-normalised (N, D) matrix whose
+    cosine similarity is at least `threshold`. The N x N similarity matrix is
+    computed block by block into one reusable (block_size, block_size) float32
+    buffer, so memory stays bounded regardless of N.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n = embeddings.shape[0]
+    block_size = max(1, min(block_size, n)) if n else 1
+    buffer = np.empty((block_size, block_size), dtype=np.float32)
+    lower = np.tri(block_size, dtype=bool)
+    threshold = np.float32(threshold)
+    pairs: List[Tuple[int, int, float]] = []
+
+    for i0 in range(0, n, block_size):
+        rows = embeddings[i0:i0 + block_size]
+        for j0 in range(i0, n, block_size):
+            cols = embeddings[j0:j0 + block_size]
+            sims = buffer[:len(rows), :len(cols)]
+            np.matmul(rows, cols.T, out=sims)
+            if j0 == i0:
+                # Diagonal block: keep only the strict upper triangle.
+                sims[lower[:len(rows), :len(cols)]] = -np.inf
+            ii, jj = np.nonzero(sims >= threshold)
+            pairs.extend(zip((ii + i0).tolist(), (jj + j0).tolist(), sims[ii, jj].tolist()))
+    return pairs
+
+
+@stage_timer("collusion")
+def detect_collusion(embeddings: np.ndarray, question_ids: Sequence[int], threshold: float = None,
+                     block_size: int = None) -> List[Dict[str, Any]]:
+    """
+    Flag near-identical answers between students. `embeddings` is the
+    (N, Q, D) student answer embedding tensor produced while scoring a cohort;
+    empty answers (zero vectors) never match.
+    """
+    collusion_cfg = cfg.get("collusion", {})
+    threshold = collusion_cfg.get("threshold", 0.92) if threshold is None else threshold
+    block_size = block_size or collusion_cfg.get("block_size", 256)
+
+    flagged = []
+    for q, qid in enumerate(question_ids):
+        for a, b, sim in similar_pairs(embeddings[:, q, :], threshold, block_size):
+            flagged.append({
+                "question_id": qid,
+                "student_a": a,
+                "student_b": b,
+                "similarity": round(sim, 4),
+            })
+    logger.info("Collusion check flagged %d answer pairs across %d questions", len(flagged), len(question_ids))
+    return flagged
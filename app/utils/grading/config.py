@@ -17,3 +17,7 @@ class Config:
     
     def __setitem__(self, key, value):
         self._cfg[key] = value
+
+
+# Shared, parsed once per process. Modules read (and the API overrides) this instance.
+cfg = Config()
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import numpy as np
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from .config import cfg
+from .logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+
+logger = get_logger(__name__)
+
+
+_SAFE_ID = re.compile(r"[^A-Za-z0-9._-]")
+_DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped store of answer embeddings per assessment.
+
+    Each assessment directory holds `vectors.bin` (float16 rows, or int8 rows
+    with a float32 scale per row in `scales.bin`) and `index.json`, which maps
+    a submission id to its row range and question ids. Re-storing a submission
+    appends new rows; `compact` drops rows no longer referenced. When the store
+    exceeds its size budget, least recently used assessments are evicted.
+    """
+
+    def __init__(self, root: str = None, dtype: str = None, max_bytes: int = None):
+        store_cfg = cfg.get("embedding_store", {})
+        self.root = root or store_cfg.get("dir", os.path.join("data", "embeddings"))
+        self.dtype = dtype or store_cfg.get("dtype", "float16")
+        if self.dtype not in _DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {self.dtype}")
+        self.max_bytes = max_bytes if max_bytes is not None else store_cfg.get("max_bytes", 1024 ** 3)
+        # Eviction scans the whole store, so it runs after this many bytes
+        # have been written or this many seconds have passed, not on every put.
+        self.evict_every_bytes = store_cfg.get("evict_every_bytes", max(1, self.max_bytes // 20))
+        self.evict_interval = store_cfg.get("evict_interval_seconds", 300)
+        self._written_since_evict = 0
+        self._last_evict = time.monotonic()
+        self._evict_lock = threading.Lock()
+        # One in-process lock per assessment directory, so work on different
+        # assessments runs concurrently; `_meta_lock` guards the dict.
+        self._path_locks: Dict[str, threading.Lock] = {}
+        self._meta_lock = threading.Lock()
+
+    # Paths and locking
+
+    def _dir(self, assessment_id: str) -> str:
+        name = _SAFE_ID.sub("_", str(assessment_id))
+        if not name.strip("."):
+            # "", "." and ".." would resolve to the store root or its parent.
+            name = "id-" + hashlib.sha256(str(assessment_id).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def _locked(self, assessment_id: str):
+        with self._locked_path(self._dir(assessment_id)) as path:
+            yield path
+
+    def _path_lock(self, path: str) -> threading.Lock:
+        key = os.path.abspath(path)
+        with self._meta_lock:
+            lock = self._path_locks.get(key)
+            if lock is None:
+                lock = self._path_locks[key] = threading.Lock()
+            return lock
+
+    @contextmanager
+    def _locked_path(self, path: str, create: bool = True):
+        """
+        Hold the assessment's lock. Yields None (without locking) if `create`
+        is off and the directory does not exist, including when it was
+        evicted while we waited for the lock.
+        """
+        with self._path_lock(path):
+            while True:
+                if create:
+                    os.makedirs(path, exist_ok=True)
+                elif not os.path.isdir(path):
+                    yield None
+                    return
+                lock_path = os.path.join(path, ".lock")
+                try:
+                    lock_file = open(lock_path, "a")
+                except FileNotFoundError:
+                    continue
+                with lock_file:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        # Eviction may have removed the directory while we waited.
+                        if not os.path.exists(lock_path) or os.stat(lock_path).st_ino != os.fstat(lock_file.fileno()).st_ino:
+                            continue
+                        yield path
+                        return
+                    finally:
+                        if fcntl:
+                            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_index(self, path: str, index: Dict[str, Any]):
+        tmp = os.path.join(path, "index.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, os.path.join(path, "index.json"))
+
+    # Encoding
+
+    def _quantize(self, vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if dtype == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    # Public API
+
+    def put(self, assessment_id: str, submission_id: str, embeddings: np.ndarray, question_ids: List[int]):
+        """Store a submission's (Q, D) embeddings, replacing any previous version."""
+        embeddings = np.atleast_2d(embeddings)
+        with self._locked(assessment_id) as path:
+            index = self._read_index(path) or {
+                "dim": int(embeddings.shape[1]), "dtype": self.dtype, "rows": 0, "submissions": {}
+            }
+            if embeddings.shape[1] != index["dim"]:
+                raise ValueError(f"Embedding dim {embeddings.shape[1]} does not match store dim {index['dim']}")
+
+            rows, scales = self._quantize(embeddings, index["dtype"])
+            row_bytes = index["dim"] * np.dtype(_DTYPES[index["dtype"]]).itemsize
+            # Drop rows left behind by a write that never reached the index.
+            with open(os.path.join(path, "vectors.bin"), "ab") as f:
+                f.truncate(index["rows"] * row_bytes)
+                f.write(rows.tobytes())
+            if scales is not None:
+                with open(os.path.join(path, "scales.bin"), "ab") as f:
+                    f.truncate(index["rows"] * 4)
+                    f.write(scales.tobytes())
+
+            index["submissions"][str(submission_id)] = {
+                "offset": index["rows"],
+                "count": len(rows),
+                "question_ids": list(question_ids),
+            }
+            index["rows"] += len(rows)
+            self._write_index(path, index)
+            live = sum(entry["count"] for entry in index["submissions"].values())
+
+        if index["rows"] > 2 * live:
+            self.compact(assessment_id)
+        self._maybe_evict(assessment_id, rows.nbytes)
+
+    def load(self, assessment_id: str, dequantize: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Memory-map an assessment's vectors. Returns the index plus `vectors`,
+        a read-only (rows, D) view of the file (and `scales` for int8), or
+        float32 vectors when `dequantize` is set.
+        """
+        # Locked so the index and files are read as one version; compact
+        # replaces the files, so maps taken here stay valid afterwards.
+        with self._locked_path(self._dir(assessment_id), create=False) as path:
+            index = path and self._read_index(path)
+            if not index or not index["rows"]:
+                return None
+            os.utime(os.path.join(path, "index.json"))
+
+            vectors = np.memmap(
+                os.path.join(path, "vectors.bin"), dtype=_DTYPES[index["dtype"]], mode="r",
+                shape=(index["rows"], index["dim"]),
+            )
+            scales = None
+            if index["dtype"] == "int8":
+                scales = np.memmap(os.path.join(path, "scales.bin"), dtype=np.float32, mode="r", shape=(index["rows"],))
+        if dequantize:
+            vectors = vectors.astype(np.float32)
+            if scales is not None:
+                vectors *= scales[:, None]
+                scales = None
+        return {"index": index, "vectors": vectors, "scales": scales}
+
+    def get(self, assessment_id: str, submission_id: str) -> Optional[Tuple[List[int], np.ndarray]]:
+        """One submission's question ids and float32 (Q, D) embeddings."""
+        loaded = self.load(assessment_id)
+        entry = loaded and loaded["index"]["submissions"].get(str(submission_id))
+        if not entry:
+            return None
+        rows = slice(entry["offset"], entry["offset"] + entry["count"])
+        vectors = np.asarray(loaded["vectors"][rows], dtype=np.float32)
+        if loaded["scales"] is not None:
+            vectors *= loaded["scales"][rows][:, None]
+        return entry["question_ids"], vectors
+
+    def compact(self, assessment_id: str):
+        """Rewrite an assessment keeping only rows referenced by its index."""
+        with self._locked(assessment_id) as path:
+            index = self._read_index(path)
+            if not index:
+                return
+            live = sum(entry["count"] for entry in index["submissions"].values())
+            if live == index["rows"]:
+                return
+            item = np.dtype(_DTYPES[index["dtype"]])
+            old = np.fromfile(os.path.join(path, "vectors.bin"), dtype=item, count=index["rows"] * index["dim"])
+            old = old.reshape(index["rows"], index["dim"])
+            old_scales = None
+            if index["dtype"] == "int8":
+                old_scales = np.fromfile(os.path.join(path, "scales.bin"), dtype=np.float32, count=index["rows"])
+
+            keep = []
+            offset = 0
+            for entry in index["submissions"].values():
+                keep.append(np.arange(entry["offset"], entry["offset"] + entry["count"]))
+                entry["offset"] = offset
+                offset += entry["count"]
+            keep = np.concatenate(keep) if keep else np.zeros(0, dtype=np.int64)
+
+            old[keep].tofile(os.path.join(path, "vectors.bin.tmp"))
+            os.replace(os.path.join(path, "vectors.bin.tmp"), os.path.join(path, "vectors.bin"))
+            if old_scales is not None:
+                old_scales[keep].tofile(os.path.join(path, "scales.bin.tmp"))
+                os.replace(os.path.join(path, "scales.bin.tmp"), os.path.join(path, "scales.bin"))
+            logger.info("Compacted embeddings for %s: %d -> %d rows", assessment_id, index['rows'], offset)
+            index["rows"] = offset
+            self._write_index(path, index)
+
+    def usage(self) -> Dict[str, Tuple[int, float]]:
+        """Bytes on disk and last access time per assessment directory."""
+        usage = {}
+        if not os.path.isdir(self.root):
+            return usage
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            index_path = os.path.join(path, "index.json")
+            if not os.path.isfile(index_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+            usage[name] = (size, os.stat(index_path).st_mtime)
+        return usage
+
+    def _maybe_evict(self, keep: str, written: int):
+        with self._evict_lock:
+            self._written_since_evict += written
+            if (self._written_since_evict < self.evict_every_bytes
+                    and time.monotonic() - self._last_evict < self.evict_interval):
+                return
+            self._written_since_evict = 0
+            self._last_evict = time.monotonic()
+        self.evict(keep=keep)
+
+    def evict(self, keep: str = None):
+        """Delete least recently used assessments until the store fits its budget."""
+        usage = self.usage()
+        total = sum(size for size, _ in usage.values())
+        if total <= self.max_bytes:
+            return
+        keep_name = os.path.basename(self._dir(keep)) if keep else None
+        for name, (size, _) in sorted(usage.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            if name == keep_name:
+                continue
+            with self._locked_path(os.path.join(self.root, name), create=False) as path:
+                if path is None:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info("Evicted embeddings for %s (%d bytes)", name, size)
+
+
+_STORE = None
+
+
+def get_embedding_store() -> EmbeddingStore:
+    global _STORE
+    if _STORE is None:
+        _STORE = EmbeddingStore()
+    return _STORE
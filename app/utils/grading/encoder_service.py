@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+from app.utils.metrics import ENCODER_BATCH_SIZE, ENCODER_QUEUE_WAIT_SECONDS
+from app.utils.tracing import current_span_context, span
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class _EncodeRequest:
+    __slots__ = ("texts", "future", "enqueued_at", "span_context")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+        # The batch runs on the service thread; its span links back to each caller.
+        self.span_context = current_span_context()
+
+
+class EncoderService:
+    """
+    In-process micro-batching front end for the sentence encoder.
+
+    Encode requests from concurrent evaluations are queued and coalesced for
+    up to `max_wait_ms` (or until `max_batch_size` texts are pending), encoded
+    with a single forward pass, and the rows are handed back to each caller.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[Optional[_EncodeRequest]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="encoder-service", daemon=True)
+                self._thread.start()
+                logger.info(
+                    "Encoder service started (max_batch_size=%d, max_wait_ms=%.1f)", self.max_batch_size, self.max_wait * 1000
+                )
+
+    def stop(self, timeout: float = 5.0):
+        """Finish the requests already queued, stop the thread and fail anything left behind."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.warning("Encoder service did not stop within %.1fs", timeout)
+                return
+            logger.info("Encoder service stopped")
+        with self._lock:
+            if self._thread is not None:
+                # Restarted by a submit() in the meantime; the queue is its again.
+                return
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item.future.set_exception(RuntimeError("Encoder service stopped"))
+
+    def submit(self, texts: List[str]) -> Future:
+        self.start()
+        request = _EncodeRequest(list(texts))
+        self._queue.put(request)
+        return request.future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def _collect(self, first: _EncodeRequest) -> List[_EncodeRequest]:
+        batch = [first]
+        pending = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait
+        while pending < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            pending += len(item.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            started = time.perf_counter()
+            texts = [t for request in batch for t in request.texts]
+            for request in batch:
+                ENCODER_QUEUE_WAIT_SECONDS.observe(started - request.enqueued_at)
+            ENCODER_BATCH_SIZE.observe(len(texts))
+
+            try:
+                with span("encoder.batch", links=[r.span_context for r in batch], texts=len(texts), callers=len(batch)):
+                    embeddings = self._encode_fn(texts)
+            except Exception as e:
+                logger.exception("Encoder batch failed")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                n = len(request.texts)
+                request.future.set_result(embeddings[offset:offset + n])
+                offset += n
+            logger.debug("Encoded batch of %d texts for %d callers", len(texts), len(batch))
@@ -1,30 +1,21 @@
 import traceback
 import re
-import unicodedata
+import numpy as np
 from typing import Dict, Any, List
 from .logger import get_logger
-from .textbook import extract_keywords
-from .semantic import similarity_score
-from .quality import quality_score
-from .rubric import validate_rubric, apply_rubric_to_answer
-from .config import Config
+from .textbook import extract_keywords_batch
+from .cohort import CohortScores, assemble_scores, score_cohort
+from .rubric import validate_rubric
+from .segmenter import StreamingSegmenter
+from .utils import clean_text
+from .config import cfg
+from app.utils.metrics import stage_timer
 
 
 logger = get_logger(__name__)
-cfg = Config()
-
-
-def clean_text(text: str) -> str:
-    if not text:
-        return ""
-    text = re.sub(r"\(cid:\d+\)", "", text)
-    text = re.sub(r"-\s*\n\s*", "", text)
-    text = unicodedata.normalize("NFKD", text)
-    text = text.encode("ascii", "ignore").decode("ascii")
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
 
 
+@stage_timer("parse_schema")
 def parse_schema(schema_text: str, max_marks: List[int] = None):
     blocks = re.split(r"\bQ(\d+)\s*[:.)]", schema_text)
     model_answers = {}
@@ -41,88 +32,90 @@ def parse_schema(schema_text: str, max_marks: List[int] = None):
         rubric["questions"].append({
             "question_id": qid,
             "max_marks": max_marks[i // 2] if max_marks and i // 2 < len(max_marks) else 0,
-            "expected_keywords": [],
             "penalties": {},
             "bonus": {},
         })
 
+    index_keywords(rubric["questions"], model_answers)
     return model_answers, rubric
 
 
+def index_keywords(questions: List[Dict[str, Any]], model_answers: Dict[int, str]):
+    """
+    Extract the ranked keyword phrases of every model answer in one batch and
+    store them on the rubric questions, so they are derived once per schema
+    rather than once per student. Questions that already carry keywords are
+    left untouched.
+    """
+    pending = [q for q in questions if "expected_keywords" not in q]
+    if not pending:
+        return
+    keywords = extract_keywords_batch([model_answers.get(q.get("question_id"), "") for q in pending])
+    for q, question_keywords in zip(pending, keywords):
+        q["expected_keywords"] = question_keywords
+
+
+@stage_timer("segment")
 def parse_student_answers(student_text: str) -> Dict[int, str]:
-    qa = {}
-    blocks = re.split(r"\bQ(\d+)\s*[:.)]", student_text)
-    for i in range(1, len(blocks), 2):
-        qid = int(blocks[i])
-        raw_block = blocks[i + 1].strip()
-        match = re.search(r"Answer\s*:\s*(.*)", raw_block, flags=re.DOTALL | re.IGNORECASE)
-        if match:
-            answer = match.group(1)
-        else:
-            answer = raw_block
-        qa[qid] = clean_text(answer)
-    return qa
+    segmenter = StreamingSegmenter()
+    return dict(segmenter.feed(student_text) + segmenter.close())
+
+
+def _weights(weights: Dict[str, float] = None) -> Dict[str, float]:
+    # Per-request weights are passed in; cfg only supplies the configured defaults.
+    if weights is not None:
+        return weights
+    return cfg.get("weights", {"similarity": 0.6, "quality": 0.3, "rubric": 0.1})
+
+
+def score_scripts(cohort_answers: List[Dict[int, str]], model_answers: Dict[int, str], rubric: Dict[str, Any],
+                  weights: Dict[str, float] = None) -> CohortScores:
+    validate_rubric(rubric)
+    questions = rubric.get("questions", [])
+    index_keywords(questions, model_answers)
+    return score_cohort(cohort_answers, model_answers, questions, _weights(weights))
+
+
+def assemble_script(student_answers: Dict[int, str], rubric: Dict[str, Any], similarity: Dict[int, float],
+                    quality: Dict[int, float], embeddings: Dict[int, np.ndarray] = None,
+                    weights: Dict[str, float] = None) -> CohortScores:
+    """
+    Build one script's scores from similarity/quality values computed
+    elsewhere (e.g. while the script was still being OCR'd). Questions
+    without a value score 0.
+    """
+    validate_rubric(rubric)
+    questions = rubric.get("questions", [])
+    qids = [q.get("question_id") for q in questions]
+    answers = [[student_answers.get(qid, "") for qid in qids]]
+    sim = np.array([[similarity.get(qid, 0.0) for qid in qids]], dtype=np.float32)
+    qual = np.array([[quality.get(qid, 0.0) for qid in qids]], dtype=np.float32)
+
+    stacked = None
+    if embeddings:
+        dim = next(iter(embeddings.values())).shape[-1]
+        stacked = np.zeros((1, len(qids), dim), dtype=np.float32)
+        for j, qid in enumerate(qids):
+            if qid in embeddings:
+                stacked[0, j] = embeddings[qid]
+    return assemble_scores(questions, answers, sim, qual, _weights(weights), stacked)
+
+
+def evaluate_cohort(cohort_answers: List[Dict[int, str]], model_answers: Dict[int, str], rubric: Dict[str, Any]) -> List[Dict[str, Any]]:
+    logger.info("========== Starting Cohort Evaluation (%d scripts) ==========", len(cohort_answers))
+    try:
+        return score_scripts(cohort_answers, model_answers, rubric).to_results()
+
+    except Exception:
+        logger.exception("FATAL ERROR during evaluate_cohort()")
+        traceback.print_exc()
+        raise
 
 
 def evaluate_script(student_answers: Dict[int, str], model_answers: Dict[int, str], rubric: Dict[str, Any]) -> Dict[str, Any]:
     logger.info("========== Starting Script Evaluation ==========")
     try:
-        validate_rubric(rubric)
-        
-        results = []
-        total_score = 0.0
-        
-        for q in rubric.get("questions", []):
-            qid = q.get("question_id")
-            student_answer = student_answers.get(qid, "")
-            model_answer = model_answers.get(qid, "")
-            
-            sim = similarity_score(model_answer, student_answer)
-            qual = quality_score(student_answer, max_score=1.0)
-            
-            question_keywords = extract_keywords(model_answer)
-            q["expected_keywords"] = question_keywords
-            rubric_score = apply_rubric_to_answer(student_answer, q)
-            
-            weights = cfg.get("weights", {"similarity": 0.6, "quality": 0.3, "rubric": 0.1})
-            max_marks = float(q.get("max_marks", 0))
-            
-            rubric_norm = (rubric_score / max_marks) if max_marks > 0 else 0.0
-            
-            combined_norm = (
-                weights["similarity"] * sim +
-                weights["quality"] * qual +
-                weights["rubric"] * rubric_norm
-            )
-            
-            final_marks = combined_norm * max_marks
-            
-            feedback = []
-            if sim < 0.4:
-                feedback.append("Answer differs substantially from expected answer.")
-            elif sim < 0.7:
-                feedback.append("Answer partially matches expected answer.")
-            else:
-                feedback.append("Answer closely matches expected answer.")
-            
-            if qual < 0.5:
-                feedback.append("Poor clarity/grammar detected.")
-            else:
-                feedback.append("Good clarity and coherence.")
-            
-            results.append({
-                "question_id": qid,
-                "student_answer": student_answer,
-                "similarity_score": round(sim, 4),
-                "quality_score": round(qual, 4),
-                "rubric_score": round(rubric_score, 4),
-                "final_marks": round(final_marks, 4),
-                "max_marks": max_marks,
-                "feedback": " ".join(feedback)
-            })
-            total_score += final_marks
-
-        return {"questions": results, "total_score": round(total_score, 4)}
+        return score_scripts([student_answers], model_answers, rubric).to_results()[0]
 
     except Exception:
         logger.exception("FATAL ERROR during evaluate_script()")
@@ -1,39 +1,229 @@
 import json
 import logging
-import pdfplumber
-from typing import List
+from contextvars import copy_context
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List
 from . import engine
-from .ocr import process_pdf
+from .collusion import detect_collusion
+from .config import cfg
+from .embedding_store import get_embedding_store
+from .ocr import iter_pdf_pages, process_pdf
+from .quality import quality_score
+from .segmenter import StreamingSegmenter
+from .semantic import batch_similarity
+from app.utils.metrics import FALLBACKS, QUESTIONS_SCORED, stage_timer
 
 
 logger = logging.getLogger(__name__)
 
 
+@stage_timer("pdf_text")
 def extract_pdf_text(pdf_path: str) -> str:
-    logger.info(f"Extracting text from {pdf_path} using pdfplumber")
+    logger.info("Extracting text from %s using pdfplumber", pdf_path)
+    import pdfplumber
     text = ""
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
             t = page.extract_text()
             if t:
                 text += t + "\n"
-    logger.info(f"Finished extracting text from {pdf_path}")
+    logger.info("Finished extracting text from %s", pdf_path)
     return text.strip()
 
 
-def run_evaluation(schema_pdf: str, student_pdf: str, max_marks: List[int] = None):
-    logger.info(f"Running evaluation for student: {student_pdf}, schema: {schema_pdf}")
-    
+@stage_timer("embedding_store")
+def store_embeddings(assessment_id: str, submission_ids: List[str], scores):
+    if not assessment_id or scores.embeddings is None or not cfg.get("embedding_store", {}).get("enabled", True):
+        return
+    store = get_embedding_store()
+    for submission_id, embeddings in zip(submission_ids, scores.embeddings):
+        try:
+            store.put(assessment_id, submission_id, embeddings, scores.question_ids)
+        except Exception:
+            logger.exception("Failed to store embeddings for %s/%s", assessment_id, submission_id)
+
+
+def _answer_similarity(model_answer: str, student_answer: str):
+    if not student_answer:
+        return 0.0, None
+    try:
+        scores, embeddings = batch_similarity([model_answer], [student_answer], return_embeddings=True)
+        return scores[0], embeddings[0]
+    except Exception:
+        logger.exception("Semantic similarity failed; scoring similarity as 0.0")
+        FALLBACKS.labels("similarity", "error").inc()
+        return 0.0, None
+
+
+class QuestionScheduler:
+    """
+    Starts similarity and quality scoring for each answer as soon as the
+    segmenter emits it, so ML work overlaps with OCR of the remaining pages.
+    Concurrent similarity calls are coalesced by the encoder service.
+    """
+
+    def __init__(self, model_answers: Dict[int, str], workers: int = None):
+        self.model_answers = model_answers
+        self.answers: Dict[int, str] = {}
+        self._futures = {}
+        self._reported = set()
+        self._emitted = set()
+        workers = workers or cfg.get("streaming", {}).get("workers", 4)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grading")
+
+    def submit(self, qid: int, answer: str):
+        self.answers[qid] = answer
+        if qid not in self.model_answers:
+            return
+        self._reported.discard(qid)
+        self._futures[qid] = (
+            self._submit(_answer_similarity, self.model_answers[qid], answer),
+            self._submit(quality_score, answer, 1.0),
+        )
+
+    def _submit(self, fn, *args):
+        # Each task runs in its own copy of the caller's context so stage
+        # timings land in the request's breakdown.
+        return self._executor.submit(copy_context().run, fn, *args)
+
+    def pop_completed(self, block: bool = False) -> List[int]:
+        """
+        Question ids whose scoring finished since the last call. With `block`,
+        waits until at least one pending question finishes (if any remain).
+        """
+        while True:
+            pending = {qid: futures for qid, futures in self._futures.items() if qid not in self._reported}
+            done = [qid for qid, futures in pending.items() if all(f.done() for f in futures)]
+            if done or not block or not pending:
+                break
+            wait([f for futures in pending.values() for f in futures if not f.done()], return_when=FIRST_COMPLETED)
+        self._reported.update(done)
+        return done
+
+    def mark_emitted(self, qid: int) -> bool:
+        """Record that a question's result was sent; True if one had been sent before."""
+        seen = qid in self._emitted
+        self._emitted.add(qid)
+        return seen
+
+    def scores_of(self, qid: int):
+        sim_future, qual_future = self._futures[qid]
+        similarity, embedding = sim_future.result()
+        return similarity, qual_future.result(), embedding
+
+    def collect(self):
+        similarity, quality, embeddings = {}, {}, {}
+        try:
+            for qid, (sim_future, qual_future) in self._futures.items():
+                similarity[qid], embedding = sim_future.result()
+                quality[qid] = qual_future.result()
+                if embedding is not None:
+                    embeddings[qid] = embedding
+        finally:
+            self.close()
+        return similarity, quality, embeddings
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _question_record(qid: int, scheduler: QuestionScheduler, rubric: Dict[str, Any],
+                     weights: Dict[str, float] = None) -> Dict[str, Any]:
+    question_rubric = {"questions": [q for q in rubric["questions"] if q.get("question_id") == qid]}
+    similarity, quality, _ = scheduler.scores_of(qid)
+    scores = engine.assemble_script(scheduler.answers, question_rubric, {qid: similarity}, {qid: quality}, weights=weights)
+    record = {"type": "question", **scores.to_results()[0]["questions"][0]}
+    if scheduler.mark_emitted(qid):
+        record["replaces_previous"] = True
+    return record
+
+
+def iter_evaluation(schema_pdf: str, student_pdf: str, max_marks: List[int] = None,
+                    assessment_id: str = None, submission_id: str = None,
+                    weights: Dict[str, float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Grade one answer sheet, yielding a {"type": "question", ...} record for
+    each question as soon as it is scored (answered questions first, in
+    completion order) and finally a {"type": "summary"} record carrying
+    `total_score` and the complete `result`.
+
+    If the sheet repeats a question header after that question was already
+    sent, the re-scored question is sent again with `"replaces_previous": true`.
+    `weights` is bound when the generator is created, so lazy consumers
+    score with the weights of the request that started it.
+    """
+    logger.info("Running evaluation for student: %s, schema: %s", student_pdf, schema_pdf)
+
     schema_text = extract_pdf_text(schema_pdf)
-    student_text = process_pdf(student_pdf)
-    
     model_answers, rubric = engine.parse_schema(schema_text, max_marks)
-    student_answers = engine.parse_student_answers(student_text)
-    
-    result = engine.evaluate_script(student_answers, model_answers, rubric)
+
+    scheduler = QuestionScheduler(model_answers)
+    try:
+        segmenter = StreamingSegmenter()
+        for page_text in iter_pdf_pages(student_pdf):
+            with stage_timer("segment"):
+                segmented = segmenter.feed(page_text)
+            for qid, answer in segmented:
+                scheduler.submit(qid, answer)
+            for qid in scheduler.pop_completed():
+                yield _question_record(qid, scheduler, rubric, weights)
+        for qid, answer in segmenter.close():
+            scheduler.submit(qid, answer)
+
+        while True:
+            completed = scheduler.pop_completed(block=True)
+            if not completed:
+                break
+            for qid in completed:
+                yield _question_record(qid, scheduler, rubric, weights)
+    except BaseException:
+        # Stops pending work if scoring fails or the consumer goes away mid-stream.
+        scheduler.close()
+        raise
+
+    similarity, quality, embeddings = scheduler.collect()
+    scores = engine.assemble_script(scheduler.answers, rubric, similarity, quality, embeddings, weights)
+    result = scores.to_results()[0]
+    QUESTIONS_SCORED.inc(len(scheduler.answers))
+    store_embeddings(assessment_id, [submission_id or student_pdf], scores)
+
+    for question in result["questions"]:
+        if question["question_id"] not in similarity:
+            yield {"type": "question", **question}
+    yield {"type": "summary", "total_score": result["total_score"], "result": result}
+
+
+@stage_timer("evaluation")
+def run_evaluation(schema_pdf: str, student_pdf: str, max_marks: List[int] = None,
+                   assessment_id: str = None, submission_id: str = None, weights: Dict[str, float] = None):
+    result = None
+    for record in iter_evaluation(schema_pdf, student_pdf, max_marks, assessment_id, submission_id, weights):
+        if record["type"] == "summary":
+            result = record["result"]
     
     with open("result.json", "w", encoding="utf-8") as f:
         json.dump(result, f, indent=2, ensure_ascii=False)
     
     logger.info("Evaluation complete. Results saved to result.json")
     return result
+
+
+@stage_timer("cohort_evaluation")
+def run_cohort_evaluation(schema_pdf: str, student_pdfs: List[str], max_marks: List[int] = None, check_collusion: bool = False,
+                          assessment_id: str = None, submission_ids: List[str] = None,
+                          weights: Dict[str, float] = None):
+    logger.info("Running cohort evaluation for %d students, schema: %s", len(student_pdfs), schema_pdf)
+
+    schema_text = extract_pdf_text(schema_pdf)
+    model_answers, rubric = engine.parse_schema(schema_text, max_marks)
+    cohort_answers = [engine.parse_student_answers(process_pdf(pdf)) for pdf in student_pdfs]
+
+    scores = engine.score_scripts(cohort_answers, model_answers, rubric, weights)
+    QUESTIONS_SCORED.inc(sum(len(answers) for answers in cohort_answers))
+    evaluation = {"results": scores.to_results()}
+    store_embeddings(assessment_id, submission_ids or student_pdfs, scores)
+    if check_collusion and scores.embeddings is not None:
+        evaluation["collusion"] = detect_collusion(scores.embeddings, scores.question_ids)
+
+    logger.info("Cohort evaluation complete for %d students", len(student_pdfs))
+    return evaluation
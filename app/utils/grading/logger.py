@@ -1,20 +1,26 @@
 import logging
+import random
 from logging import Logger
-from .config import Config
-
-
-cfg = Config()
+from .config import cfg
 
 
 def get_logger(name: str = "smart_grader") -> Logger:
+    # Output goes through the root logger's handlers (see app/utils/log_handler.py);
+    # grading loggers only set their level.
     level_name = cfg.get('logging', {}).get('level', 'INFO').upper()
-    level = getattr(logging, level_name, logging.INFO)
     logger = logging.getLogger(name)
-    if not logger.handlers:
-        logger.setLevel(level)
-        ch = logging.StreamHandler()
-        ch.setLevel(level)
-        formatter = logging.Formatter('[%(asctime)s] %(levelname)s - %(name)s - %(message)s')
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
+    logger.setLevel(getattr(logging, level_name, logging.INFO))
     return logger
+
+
+def log_sampled(logger: Logger, level: int, msg: str, *args, rate: float = None):
+    """
+    Log a per-answer message for only a fraction of calls (`logging.sample_rate`
+    by default), so hot loops can keep their debug output without paying for
+    it on every question. Arguments are formatted only if the record is kept.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = cfg.get('logging', {}).get('sample_rate', 0.01) if rate is None else rate
+    if rate >= 1.0 or random.random() < rate:
+        logger.log(level, msg, *args)
@@ -0,0 +1,209 @@
+import re
+import string
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from app.utils.metrics import record_cache
+
+
+# Punctuation becomes a token of its own, so "cell-wall" matches "cell" but
+# "cells" does not.
+_SPLIT_PUNCTUATION = str.maketrans({ch: f" {ch} " for ch in string.punctuation if ch != "_"})
+
+
+def tokenize(text: str) -> List[str]:
+    return str(text).lower().translate(_SPLIT_PUNCTUATION).split()
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over the tokens of lower-cased terms grouped by
+    category (e.g. keywords, bonus). `find` reports every term that
+    occurs in the text as a whole-token sequence, for all categories, in one
+    linear pass over the text's tokens.
+    """
+
+    def __init__(self, terms: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._owners: List[List[Tuple[str, str]]] = []
+
+        index: Dict[Tuple[str, ...], int] = {}
+        for category, raw_terms in terms.items():
+            for raw in raw_terms:
+                term = tuple(tokenize(raw))
+                if not term:
+                    continue
+                if term not in index:
+                    index[term] = len(self._owners)
+                    self._owners.append([])
+                    self._insert(term, index[term])
+                self._owners[index[term]].append((category, raw))
+        self._build_failure_links()
+        self._vocabulary = frozenset(self._goto[0]).union(*(g.keys() for g in self._goto))
+
+    def _insert(self, term: Tuple[str, ...], term_id: int):
+        state = 0
+        for ch in term:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(term_id)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Dict[str, Set[str]]:
+        """Return, per category, the set of original terms found in `text`."""
+        found: Dict[str, Set[str]] = {}
+        if not self._owners or not text:
+            return found
+        goto, fail, out, vocabulary = self._goto, self._fail, self._out, self._vocabulary
+        seen: Set[int] = set()
+        state = 0
+
+        for token in tokenize(text):
+            if token not in vocabulary:
+                state = 0
+                continue
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if out[state]:
+                seen.update(out[state])
+
+        for term_id in seen:
+            for category, raw in self._owners[term_id]:
+                found.setdefault(category, set()).add(raw)
+        return found
+
+
+_PUNCTUATION = frozenset(string.punctuation) - {"_"}
+# A character that is part of a word token: not whitespace, not split-off punctuation.
+_WORD_CHAR = "[^\\s" + re.escape("".join(sorted(_PUNCTUATION))) + "]"
+
+
+def _is_word_char(ch: str) -> bool:
+    return not ch.isspace() and ch not in _PUNCTUATION
+
+
+def _term_pattern(tokens: List[str]) -> "re.Pattern":
+    """
+    Regex matching `tokens` as a whole-token sequence, exactly as `tokenize`
+    would split it, from the position it is matched at. The boundary before
+    the first token is checked by the caller: a leading lookbehind would stop
+    `re` from skipping ahead to the literal.
+    """
+    parts = [re.escape(tokens[0])]
+    for previous, token in zip(tokens, tokens[1:]):
+        between_words = token not in _PUNCTUATION and previous not in _PUNCTUATION
+        parts.append(r"\s+" if between_words else r"\s*")
+        parts.append(re.escape(token))
+    if tokens[-1] not in _PUNCTUATION:
+        parts.append(f"(?!{_WORD_CHAR})")
+    return re.compile("".join(parts))
+
+
+class ScanMatcher:
+    """
+    Same results as KeywordMatcher for a handful of terms, the usual size of
+    a rubric question: each term's first token is located with `str.find` on
+    the lower-cased text and only those positions are checked against a
+    token-bounded regex. Its cost grows with the number of terms.
+    """
+
+    def __init__(self, terms: Dict[str, Iterable[str]]):
+        self._terms: List[Tuple[str, str, str, bool, Optional["re.Pattern"]]] = []
+        for category, raw_terms in terms.items():
+            for raw in raw_terms:
+                tokens = tokenize(raw)
+                if tokens:
+                    # Single-token terms (most keywords) skip the regex.
+                    pattern = _term_pattern(tokens) if len(tokens) > 1 else None
+                    self._terms.append((category, raw, tokens[0], tokens[0] not in _PUNCTUATION, pattern))
+
+    def find(self, text: str) -> Dict[str, Set[str]]:
+        """Return, per category, the set of original terms found in `text`."""
+        found: Dict[str, Set[str]] = {}
+        if not self._terms or not text:
+            return found
+        text = str(text).lower()
+        size = len(text)
+        for category, raw, first, bounded, pattern in self._terms:
+            at = text.find(first)
+            while at != -1:
+                if not bounded or at == 0 or not _is_word_char(text[at - 1]):
+                    if pattern is not None:
+                        matched = pattern.match(text, at) is not None
+                    else:
+                        end = at + len(first)
+                        matched = not bounded or end == size or not _is_word_char(text[end])
+                    if matched:
+                        found.setdefault(category, set()).add(raw)
+                        break
+                at = text.find(first, at + 1)
+        return found
+
+
+Matcher = Union[KeywordMatcher, ScanMatcher]
+
+# Below this many terms per question ScanMatcher is faster than the
+# pure-Python automaton (see benchmarks/rubric_matcher.py).
+AUTOMATON_MIN_TERMS = 30
+MATCHER_CACHE_SIZE = 1024
+
+_MATCHERS: "OrderedDict[Tuple, Matcher]" = OrderedDict()
+_MATCHERS_LOCK = threading.Lock()
+
+
+def _cached(keywords: Tuple[str, ...], bonus: Tuple[str, ...]) -> Tuple[Matcher, bool]:
+    """The matcher for these terms and whether it came from the cache."""
+    key = (keywords, bonus)
+    with _MATCHERS_LOCK:
+        matcher = _MATCHERS.get(key)
+        if matcher is not None:
+            _MATCHERS.move_to_end(key)
+            return matcher, True
+    terms = {"keywords": keywords, "bonus": bonus}
+    matcher = (KeywordMatcher if len(keywords) + len(bonus) >= AUTOMATON_MIN_TERMS else ScanMatcher)(terms)
+    with _MATCHERS_LOCK:
+        _MATCHERS[key] = matcher
+        while len(_MATCHERS) > MATCHER_CACHE_SIZE:
+            _MATCHERS.popitem(last=False)
+    return matcher, False
+
+
+def clear_cache():
+    with _MATCHERS_LOCK:
+        _MATCHERS.clear()
+
+
+def get_matcher(rubric_for_question: Dict) -> Matcher:
+    """
+    Compiled matcher for one rubric question's expected keywords and bonus
+    terms. Matchers are cached on the question's terms, so a schema's
+    matchers are built once and reused for every student graded against it.
+    """
+    bonus = rubric_for_question.get('bonus', {}) or {}
+    matcher, hit = _cached(
+        tuple(rubric_for_question.get('expected_keywords', []) or []),
+        tuple(k for k, v in bonus.items() if isinstance(v, (int, float))),
+    )
+    record_cache("rubric_matcher", hit=hit)
+    return matcher
@@ -1,41 +1,87 @@
-import os, platform
-from pdf2image import convert_from_path
-from google.cloud import vision
+import hashlib, io, os, platform
+from typing import Iterator
+from app.utils.metrics import PAGES_PROCESSED, stage_timer
+from app.utils.tracing import span
+from .replay import replay_mode, replayable
 
 
-if not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
-    default_sa = os.path.join(os.path.dirname(__file__), "credentials", "gcloud-service-account.json")
-    if os.path.exists(default_sa):
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = default_sa
+_CLIENT = None
 
 
-client = vision.ImageAnnotatorClient()
+def _get_client():
+    global _CLIENT
+    if _CLIENT is None:
+        from google.cloud import vision
+        if not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+            default_sa = os.path.join(os.path.dirname(__file__), "credentials", "gcloud-service-account.json")
+            if os.path.exists(default_sa):
+                os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = default_sa
+        _CLIENT = vision.ImageAnnotatorClient()
+    return _CLIENT
 
 
 def extract_text_from_image(image_bytes: bytes) -> str:
+    from google.cloud import vision
     image = vision.Image(content=image_bytes)
-    response = client.document_text_detection(image=image)
+    response = _get_client().document_text_detection(image=image)
     if response.error.message:
         raise Exception(f"Vision API error: {response.error.message}")
     return response.full_text_annotation.text
 
 
-def process_pdf(pdf_path: str) -> str:
-    if platform.system() == "Windows":
-        pages = convert_from_path(
-            pdf_path,
-            poppler_path=r"C:\Users\aniru\Downloads\Release-25.11.0-0\poppler-25.11.0\Library\bin"
-        )
-    else:
-        pages = convert_from_path(pdf_path)
+# Keyed on the source PDF and page number rather than the image: rasterized
+# bytes change whenever poppler or Pillow do, which would orphan recordings.
+@stage_timer("ocr")
+@replayable("vision", key=lambda pdf_digest, number, image_bytes: f"{pdf_digest}:{number}".encode("utf-8"))
+def recognize_page(pdf_digest: str, number: int, image_bytes: bytes) -> str:
+    return extract_text_from_image(image_bytes)
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_POPPLER_PATH = (
+    r"C:\Users\aniru\Downloads\Release-25.11.0-0\poppler-25.11.0\Library\bin"
+    if platform.system() == "Windows" else None
+)
+
 
+def pdf_page_count(pdf_path: str) -> int:
+    from pdf2image import pdfinfo_from_path
+    return pdfinfo_from_path(pdf_path, poppler_path=_POPPLER_PATH)["Pages"]
+
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[str]:
+    """
+    Rasterize and OCR a PDF one page at a time, yielding each page's text as
+    soon as it is recognised so downstream scoring can start early.
+    """
+    from pdf2image import convert_from_path
+    page_count = pdf_page_count(pdf_path)
+    # Only needed to key recordings.
+    pdf_digest = _file_digest(pdf_path) if replay_mode() != "off" else ""
+
+    for number in range(1, page_count + 1):
+        with span("page.rasterize", page=number), stage_timer("rasterize"):
+            page = convert_from_path(pdf_path, first_page=number, last_page=number, poppler_path=_POPPLER_PATH)[0]
+            with io.BytesIO() as buffer:
+                page.save(buffer, format="PNG")
+                image_bytes = buffer.getvalue()
+            page.close()
+        with span("page.ocr", page=number, image_bytes=len(image_bytes)):
+            text = recognize_page(pdf_digest, number, image_bytes)
+        PAGES_PROCESSED.inc()
+        yield text
+
+
+def process_pdf(pdf_path: str) -> str:
     all_text = ""
-    for i, page in enumerate(pages):
-        import io
-        with io.BytesIO() as buffer:
-            page.save(buffer, format="PNG")
-            image_bytes = buffer.getvalue()
-        text = extract_text_from_image(image_bytes)
+    for i, text in enumerate(iter_pdf_pages(pdf_path)):
         all_text += f"\n--- Page {i+1} ---\n{text}\n"
 
     return all_text
@@ -1,22 +1,32 @@
+import logging
 import re
 import multiprocessing as mp
 import time
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from typing import Dict
-from .logger import get_logger
-from .config import Config
+from .logger import get_logger, log_sampled
+from .config import cfg
+from app.utils.metrics import FALLBACKS, stage_timer
+from app.utils.tracing import set_span_attribute, span
+from .replay import replayable
 
 
 logger = get_logger(__name__)
-cfg = Config()
-_SENT_ANALYZER = SentimentIntensityAnalyzer()
+_SENT_ANALYZER = None
+
+
+def _get_sentiment_analyzer():
+    global _SENT_ANALYZER
+    if _SENT_ANALYZER is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _SENT_ANALYZER = SentimentIntensityAnalyzer()
+    return _SENT_ANALYZER
 
 
 def sentiment_score(text: str) -> Dict[str, float]:
     if not text:
         return {"compound": 0.0, "pos": 0.0, "neg": 0.0, "neu": 0.0}
-    scores = _SENT_ANALYZER.polarity_scores(text)
-    logger.debug(f"Sentiment scores: {scores}")
+    scores = _get_sentiment_analyzer().polarity_scores(text)
+    log_sampled(logger, logging.DEBUG, "Sentiment scores: %s", scores)
     return scores
 
 
@@ -28,26 +38,51 @@ def _language_tool_available() -> bool:
         return False
 
 
-def _lt_worker(text: str, q: mp.Queue):
+def _lt_worker(text: str, q: mp.Queue, server_url: str = None):
     try:
         from language_tool_python import LanguageTool
-        tool = LanguageTool('en-US')
+        # A shared LanguageTool server avoids starting a JVM in every worker.
+        tool = LanguageTool('en-US', remote_server=server_url) if server_url else LanguageTool('en-US')
         matches = tool.check(text)
         q.put({"ok": len(matches)})
     except Exception as e:
         q.put({"error": str(e)})
 
 
+def check_languagetool_server(server_url: str, text: str) -> int:
+    """
+    Check `text` against the shared LanguageTool server directly, with no
+    heuristic fallback, so a failure raises. Used by warmup.
+    """
+    from language_tool_python import LanguageTool
+    with LanguageTool('en-US', remote_server=server_url) as tool:
+        return len(tool.check(text))
+
+
+def _fallback(text: str, reason: str) -> int:
+    FALLBACKS.labels("grammar", reason).inc()
+    set_span_attribute("grammar.fallback", reason)
+    return _heuristic_grammar_issues(text)
+
+
+@stage_timer("grammar")
 def grammar_issues_count(text: str) -> int:
+    with span("grammar.check", chars=len(text or "")):
+        return _grammar_issues_count(text)
+
+
+@replayable("grammar", key=lambda text: (text or "").encode("utf-8"))
+def _grammar_issues_count(text: str) -> int:
     if not text:
         return 0
     timeout_sec = cfg.get("quality", {}).get("languagetool_timeout_seconds", 6)
+    server_url = cfg.get("quality", {}).get("languagetool_server_url")
     if not _language_tool_available():
         logger.debug("Using heuristic grammar check (LanguageTool unavailable).")
-        return _heuristic_grammar_issues(text)
+        return _fallback(text, "unavailable")
     
     q: mp.Queue = mp.Queue()
-    p = mp.Process(target=_lt_worker, args=(text, q))
+    p = mp.Process(target=_lt_worker, args=(text, q, server_url))
     p.daemon = True
     start = time.time()
     
@@ -58,20 +93,20 @@ def grammar_issues_count(text: str) -> int:
             logger.warning("LanguageTool check timed out; terminating and using heuristic fallback.")
             p.terminate()
             p.join(1)
-            return _heuristic_grammar_issues(text)
+            return _fallback(text, "timeout")
         
         if not q.empty():
             res = q.get()
             if "ok" in res:
                 issues = int(res["ok"])
-                logger.info(f"LanguageTool reported {issues} issues (took {time.time()-start:.2f}s).")
+                log_sampled(logger, logging.DEBUG, "LanguageTool reported %d issues (took %.2fs).", issues, time.time() - start)
                 return issues
             else:
-                logger.warning(f"LanguageTool worker returned error: {res.get('error')}. Using heuristic fallback.")
-                return _heuristic_grammar_issues(text)
+                logger.warning("LanguageTool worker returned error: %s. Using heuristic fallback.", res.get('error'))
+                return _fallback(text, "error")
         else:
             logger.warning("LanguageTool returned no result; using heuristic fallback.")
-            return _heuristic_grammar_issues(text)
+            return _fallback(text, "no_result")
             
     except Exception:
         logger.exception("LanguageTool check failed unexpectedly; using heuristic fallback.")
@@ -80,7 +115,14 @@ def grammar_issues_count(text: str) -> int:
                 p.terminate()
         except Exception:
             pass
-        return _heuristic_grammar_issues(text)
+        return _fallback(text, "exception")
+    finally:
+        # Release the queue's pipe and feeder thread and reap the worker;
+        # otherwise every check leaves them behind until garbage collection.
+        q.close()
+        q.join_thread()
+        if not p.is_alive():
+            p.close()
 
 
 def _heuristic_grammar_issues(text: str) -> int:
@@ -90,10 +132,12 @@ def _heuristic_grammar_issues(text: str) -> int:
     single_letter_tokens = sum(1 for tok in text.split() if len(tok) == 1)
     
     issues = short_fragments + repeated_punct + int(single_letter_tokens / 10)
-    logger.debug(f"Heuristic grammar issues: short={short_fragments}, repeated={repeated_punct}, letters={single_letter_tokens}, total={issues}")
+    log_sampled(logger, logging.DEBUG, "Heuristic grammar issues: short=%d, repeated=%d, letters=%d, total=%d",
+                short_fragments, repeated_punct, single_letter_tokens, issues)
     return int(issues)
 
 
+@stage_timer("quality")
 def quality_score(text: str, max_score: float = 1.0) -> float:
     if not text:
         return 0.0
@@ -107,7 +151,7 @@ def quality_score(text: str, max_score: float = 1.0) -> float:
         sentiment_factor = (compound + 1) / 2
         
         score = max(0.0, min(max_score, (0.7 * (1 - penalty) + 0.3 * sentiment_factor) * max_score))
-        logger.info(f"Computed quality score: {score:.4f} (issues={issues}, compound={compound:.3f})")
+        log_sampled(logger, logging.DEBUG, "Computed quality score: %.4f (issues=%d, compound=%.3f)", score, issues, compound)
         return score
     except Exception:
         logger.exception("Quality scoring failed; returning 0.0")
@@ -0,0 +1,105 @@
+import functools
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict
+from .config import cfg
+from .logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when no recording exists for an input."""
+
+
+def replay_mode() -> str:
+    return (cfg.get("replay", {}) or {}).get("mode", "off") or "off"
+
+
+def _entry_path(kind: str, digest: str) -> str:
+    root = cfg.get("replay", {}).get("dir", "data/replay")
+    return os.path.join(root, kind, digest[:2], f"{digest}.json")
+
+
+@functools.lru_cache(maxsize=4096)
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(path: str, entry: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A unique temporary name, so threads recording the same entry do not collide.
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(path),
+                                     suffix=".tmp", delete=False) as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(f.name, path)
+
+
+def _simulate_latency(recorded: float):
+    """
+    Sleep as the live call would have. `latency` selects the model:
+    "recorded" (the measured duration, times `latency_scale`), "lognormal"
+    (median `latency_median_ms`, shape `latency_sigma`) or "none".
+    """
+    replay_cfg = cfg.get("replay", {})
+    model = replay_cfg.get("latency", "recorded")
+    if model == "recorded":
+        delay = (recorded or 0.0) * replay_cfg.get("latency_scale", 1.0)
+    elif model == "lognormal":
+        median = replay_cfg.get("latency_median_ms", 500) / 1000.0
+        delay = random.lognormvariate(math.log(max(median, 1e-6)), replay_cfg.get("latency_sigma", 0.5))
+    else:
+        delay = 0.0
+    if delay > 0:
+        time.sleep(delay)
+
+
+def replayable(kind: str, key: Callable[..., bytes]):
+    """
+    Wrap a call to an external service so its results can be recorded and
+    replayed (config section `replay`). `key` maps the call's arguments to the
+    bytes whose sha256 identifies the recording.
+
+      - "off":    call through
+      - "record": call through and store the result (or error) and latency
+      - "replay": serve the stored result without calling the service;
+                  a missing recording raises ReplayMissError
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            mode = replay_mode()
+            if mode == "off":
+                return fn(*args, **kwargs)
+
+            digest = hashlib.sha256(key(*args, **kwargs)).hexdigest()
+            path = _entry_path(kind, digest)
+
+            if mode == "replay":
+                try:
+                    entry = _load(path)
+                except FileNotFoundError:
+                    raise ReplayMissError(f"No {kind} recording for input {digest[:12]} in {path}")
+                _simulate_latency(entry.get("latency"))
+                if "error" in entry:
+                    raise Exception(entry["error"])
+                return entry["result"]
+
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                _save(path, {"error": str(e), "latency": time.perf_counter() - start})
+                raise
+            _save(path, {"result": result, "latency": time.perf_counter() - start})
+            logger.debug("Recorded %s response %s", kind, digest[:12])
+            return result
+        return wrapper
+    return decorator
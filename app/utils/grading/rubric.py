@@ -1,5 +1,7 @@
 from typing import Dict, Any
-from .logger import get_logger
+import logging
+from .logger import get_logger, log_sampled
+from .matcher import get_matcher
 
 
 logger = get_logger(__name__)
@@ -26,10 +28,11 @@ def apply_rubric_to_answer(student_answer: str, rubric_for_question: Dict[str, A
         
         ans = (student_answer or "").lower()
         score = 0.0
+        matched = get_matcher(rubric_for_question).find(ans)
         
-        expected = [k.lower() for k in rubric_for_question.get('expected_keywords', [])]
+        expected = rubric_for_question.get('expected_keywords', [])
         if expected:
-            found = sum(1 for kw in expected if kw in ans)
+            found = sum(1 for kw in expected if kw in matched.get('keywords', ()))
             keyword_fraction = found / len(expected)
             score += keyword_fraction * max_marks * 0.7
         else:
@@ -48,13 +51,13 @@ def apply_rubric_to_answer(student_answer: str, rubric_for_question: Dict[str, A
         bonus_total = 0.0
         bonus = rubric_for_question.get('bonus', {})
         for k, v in bonus.items():
-            if isinstance(v, (int, float)) and k in ans:
+            if isinstance(v, (int, float)) and k in matched.get('bonus', ()):
                 bonus_total += float(v)
         
         score += bonus_total
         score = max(0.0, min(max_marks, float(score)))
         
-        logger.debug(f"Rubric score before clamp: {score} for max {max_marks}")
+        log_sampled(logger, logging.DEBUG, "Rubric score before clamp: %s for max %s", score, max_marks)
         return score
     except Exception:
         logger.exception("apply_rubric_to_answer failed")
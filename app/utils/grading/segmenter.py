@@ -0,0 +1,58 @@
+import re
+from typing import List, Optional, Tuple
+from .utils import clean_text
+
+
+QUESTION_HEADER = re.compile(r"\bQ(\d+)\s*[:.)]")
+PAGE_MARKER = re.compile(r"^--- Page \d+ ---$", flags=re.MULTILINE)
+ANSWER_LABEL = re.compile(r"Answer\s*:\s*(.*)", flags=re.DOTALL | re.IGNORECASE)
+
+# Longest text kept from before the first question header, enough to hold a
+# header split across a page boundary.
+_PREAMBLE_TAIL = 32
+
+
+def extract_answer(raw_block: str) -> str:
+    raw_block = raw_block.strip()
+    match = ANSWER_LABEL.search(raw_block)
+    return clean_text(match.group(1) if match else raw_block)
+
+
+class StreamingSegmenter:
+    """
+    Incremental version of splitting an answer sheet on `Qn:` headers.
+
+    Page text is fed as it arrives. Only the text of the currently open
+    question is buffered across page boundaries, `--- Page i ---` markers are
+    dropped, and each (question id, answer) pair is returned as soon as the
+    next header closes it. `close` flushes the last open question.
+    """
+
+    def __init__(self):
+        self._qid: Optional[int] = None
+        self._buffer = ""
+
+    def feed(self, page_text: str) -> List[Tuple[int, str]]:
+        self._buffer += "\n" + PAGE_MARKER.sub("", page_text or "")
+        completed = []
+        last_end = None
+        for match in QUESTION_HEADER.finditer(self._buffer):
+            if self._qid is not None:
+                start = last_end if last_end is not None else 0
+                completed.append((self._qid, extract_answer(self._buffer[start:match.start()])))
+            self._qid = int(match.group(1))
+            last_end = match.end()
+
+        if last_end is not None:
+            self._buffer = self._buffer[last_end:]
+        elif self._qid is None:
+            self._buffer = self._buffer[-_PREAMBLE_TAIL:]
+        return completed
+
+    def close(self) -> List[Tuple[int, str]]:
+        completed = []
+        if self._qid is not None:
+            completed.append((self._qid, extract_answer(self._buffer)))
+        self._qid = None
+        self._buffer = ""
+        return completed
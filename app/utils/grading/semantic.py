@@ -1,50 +1,180 @@
-from sentence_transformers import SentenceTransformer, util
-from typing import List
-from .config import Config
-from .logger import get_logger
+import logging
+import re
+import numpy as np
+from typing import Dict, List, Tuple
+from .config import cfg
+from .encoder_service import EncoderService
+from .logger import get_logger, log_sampled
+from app.utils.metrics import stage_timer
 
 
 logger = get_logger(__name__)
-cfg = Config()
 
 
 _MODEL = None
+_SERVICE = None
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
 
 
 def _get_model():
     global _MODEL
     if _MODEL is None:
+        from sentence_transformers import SentenceTransformer
         model_name = cfg.get('similarity', {}).get('model_name', 'all-MiniLM-L6-v2')
-        logger.info(f"Loading sentence-transformers model: {model_name}")
+        logger.info("Loading sentence-transformers model: %s", model_name)
         _MODEL = SentenceTransformer(model_name)
     return _MODEL
 
 
+def get_encoder_service() -> EncoderService:
+    global _SERVICE
+    if _SERVICE is None:
+        service_cfg = cfg.get('similarity', {}).get('encoder_service', {})
+        _SERVICE = EncoderService(
+            _encode_batch,
+            max_batch_size=service_cfg.get('max_batch_size', 64),
+            max_wait_ms=service_cfg.get('max_wait_ms', 5),
+        )
+    return _SERVICE
+
+
+def stop_encoder_service():
+    """Stop the encoder service's thread, if it was ever started."""
+    if _SERVICE is not None:
+        _SERVICE.stop()
+
+
+def split_into_chunks(text: str, max_words: int = None, overlap_sentences: int = None) -> List[str]:
+    """
+    Split an answer into overlapping windows of whole sentences so that each
+    window fits the encoder's word-piece limit. Short answers yield one chunk.
+    """
+    if not text:
+        return []
+    sim_cfg = cfg.get('similarity', {})
+    max_words = max_words or sim_cfg.get('chunk_max_words', 160)
+    if overlap_sentences is None:
+        overlap_sentences = sim_cfg.get('chunk_overlap_sentences', 1)
+
+    sentences = [s for s in _SENTENCE_SPLIT.split(text.strip()) if s]
+    if len(text.split()) <= max_words:
+        return [text.strip()]
+
+    chunks = []
+    start = 0
+    while start < len(sentences):
+        end = start
+        words = 0
+        while end < len(sentences):
+            n = len(sentences[end].split())
+            if words and words + n > max_words:
+                break
+            words += n
+            end += 1
+        chunks.append(" ".join(sentences[start:end]))
+        if end >= len(sentences):
+            break
+        start = max(start + 1, end - overlap_sentences)
+    return chunks
+
+
+@stage_timer("encode")
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    """
+    Run one encoder call over `texts`. Inputs are ordered by length so that
+    each batch holds similarly sized sequences and padding is kept small; rows
+    of the result follow the original order and are L2-normalised float32.
+    """
+    model = _get_model()
+    batch_size = cfg.get('similarity', {}).get('batch_size', 32)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    encoded = model.encode(
+        [texts[i] for i in order],
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+    embeddings = np.empty_like(encoded, dtype=np.float32)
+    embeddings[order] = encoded
+    return embeddings
+
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    if not texts:
+        return np.zeros((0, _get_model().get_sentence_embedding_dimension()), dtype=np.float32)
+    if cfg.get('similarity', {}).get('encoder_service', {}).get('enabled', True):
+        return get_encoder_service().encode(texts)
+    return _encode_batch(texts)
+
+
+def _aggregate(sim_matrix: np.ndarray) -> float:
+    method = cfg.get('similarity', {}).get('chunk_aggregation', 'mean')
+    if method == 'max':
+        return float(sim_matrix.max())
+    # Mean over model chunks of their best-matching student chunk, i.e. how
+    # much of the expected answer the student covers.
+    return float(sim_matrix.max(axis=1).mean())
+
+
 def similarity_score(model_answer: str, student_answer: str) -> float:
     try:
-        model = _get_model()
         if (not model_answer) or (not student_answer):
             return 0.0
-        emb_model = model.encode(model_answer, convert_to_tensor=True)
-        emb_student = model.encode(student_answer, convert_to_tensor=True)
-        
-        sim = util.pytorch_cos_sim(emb_model, emb_student).item()
-        sim = max(0.0, min(1.0, float(sim)))
-        
-        logger.debug(f"Similarity: {sim}")
+        sim = batch_similarity([model_answer], [student_answer])[0]
+        log_sampled(logger, logging.DEBUG, "Similarity: %s", sim)
         return sim
     except Exception as e:
         logger.exception("Semantic similarity failed")
         return 0.0
 
 
-def batch_similarity(model_answers: List[str], student_answers: List[str]) -> List[float]:
-    model = _get_model()
-    
-    emb_model = model.encode(model_answers, convert_to_tensor=True)
-    emb_student = model.encode(student_answers, convert_to_tensor=True)
-    
-    sim = util.pytorch_cos_sim(emb_model, emb_student)
-    
-    scores = sim.diag().tolist() 
-    return [max(0.0, min(1.0, float(s))) for s in scores]
+@stage_timer("similarity")
+def batch_similarity(model_answers: List[str], student_answers: List[str], return_embeddings: bool = False):
+    """
+    Similarity of each (model, student) answer pair. Every distinct chunk is
+    encoded once in a single encoder call, so a model answer shared by a whole
+    cohort is only encoded once. With `return_embeddings`, also returns one
+    L2-normalised (mean of chunks) float32 vector per student answer, zero for
+    empty answers.
+    """
+    index: Dict[str, int] = {}
+    texts: List[str] = []
+
+    def _add(chunks: List[str]) -> List[int]:
+        ids = []
+        for chunk in chunks:
+            if chunk not in index:
+                index[chunk] = len(texts)
+                texts.append(chunk)
+            ids.append(index[chunk])
+        return ids
+
+    pairs: List[Tuple[List[int], List[int]]] = []
+    for model_answer, student_answer in zip(model_answers, student_answers):
+        student_ids = _add(split_into_chunks(student_answer)) if student_answer else []
+        model_ids = _add(split_into_chunks(model_answer)) if (model_answer and student_ids) else []
+        pairs.append((model_ids, student_ids))
+
+    embeddings = encode_texts(texts) if texts else None
+    logger.debug("Encoded %d distinct chunks for %d answer pairs", len(texts), len(pairs))
+
+    scores = []
+    for model_ids, student_ids in pairs:
+        if not model_ids or not student_ids:
+            scores.append(0.0)
+            continue
+        sim_matrix = embeddings[model_ids] @ embeddings[student_ids].T
+        scores.append(max(0.0, min(1.0, _aggregate(sim_matrix))))
+
+    if not return_embeddings:
+        return scores
+
+    dim = embeddings.shape[1] if embeddings is not None else _get_model().get_sentence_embedding_dimension()
+    student_embeddings = np.zeros((len(pairs), dim), dtype=np.float32)
+    for i, (_, student_ids) in enumerate(pairs):
+        if student_ids:
+            pooled = embeddings[student_ids].mean(axis=0)
+            norm = np.linalg.norm(pooled)
+            if norm > 0:
+                student_embeddings[i] = pooled / norm
+    return scores, student_embeddings
@@ -1,39 +1,74 @@
-from rake_nltk import Rake
+import threading
 from typing import List
 from .logger import get_logger
-from .config import Config
-import nltk
+from .config import cfg
+from app.utils.metrics import stage_timer
 
 
 logger = get_logger(__name__)
-cfg = Config()
 
 
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    logger.info("Downloading punkt")
-    nltk.download('punkt')
+_NLTK_READY = False
+_NLTK_RESOURCES = (
+    ('tokenizers/punkt', 'punkt'),
+    ('tokenizers/punkt_tab', 'punkt_tab'),
+    ('corpora/stopwords', 'stopwords'),
+)
 
-try:
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    logger.info("Downloading punkt_tab")
-    nltk.download('punkt_tab')
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    logger.info("Downloading stopwords")
-    nltk.download('stopwords')
+def _ensure_nltk_data():
+    global _NLTK_READY
+    if _NLTK_READY:
+        return
+    import nltk
+    for path, package in _NLTK_RESOURCES:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            logger.info("Downloading %s", package)
+            nltk.download(package)
+    _NLTK_READY = True
+
+
+_STOPWORDS = None
+_LOCAL = threading.local()
+
+
+def _get_stopwords():
+    global _STOPWORDS
+    if _STOPWORDS is None:
+        _ensure_nltk_data()
+        from nltk.corpus import stopwords
+        _STOPWORDS = set(stopwords.words('english'))
+    return _STOPWORDS
+
+
+def _get_rake():
+    # Rake keeps per-call state, so each thread reuses its own instance built
+    # from the shared stopword set.
+    rake = getattr(_LOCAL, 'rake', None)
+    if rake is None:
+        from rake_nltk import Rake
+        rake = _LOCAL.rake = Rake(stopwords=_get_stopwords())
+    return rake
+
+
+@stage_timer("keywords")
+def extract_keywords_batch(texts: List[str], num_keywords: int = None) -> List[List[str]]:
+    num_keywords = num_keywords or cfg.get('keyword', {}).get('num_keywords', 15)
+    rake = _get_rake()
+    keywords = []
+    for text in texts:
+        if not text:
+            keywords.append([])
+            continue
+        rake.extract_keywords_from_text(text)
+        keywords.append(rake.get_ranked_phrases()[:num_keywords])
+    logger.debug("Extracted keywords for %d texts", len(texts))
+    return keywords
 
 
 def extract_keywords(text: str, num_keywords: int = None) -> List[str]:
     if not text:
         return []
-    num_keywords = num_keywords or cfg.get('keyword', {}).get('num_keywords', 15)
-    r = Rake()
-    r.extract_keywords_from_text(text)
-    ranked = r.get_ranked_phrases()
-    logger.debug(f"Extracted {len(ranked)} keywords/phrases")
-    return ranked[:num_keywords]
+    return extract_keywords_batch([text], num_keywords)[0]
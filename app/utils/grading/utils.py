@@ -1,4 +1,6 @@
 import os
+import re
+import unicodedata
 from typing import Any, Dict
 from .logger import get_logger
 
@@ -6,6 +8,17 @@ from .logger import get_logger
 logger = get_logger(__name__)
 
 
+def clean_text(text: str) -> str:
+    if not text:
+        return ""
+    text = re.sub(r"\(cid:\d+\)", "", text)
+    text = re.sub(r"-\s*\n\s*", "", text)
+    text = unicodedata.normalize("NFKD", text)
+    text = text.encode("ascii", "ignore").decode("ascii")
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
 def safe_load_text(text: str) -> str:
     if text is None:
         return ""
@@ -17,4 +30,4 @@ def save_json(path: str, data: Dict[str, Any]):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
-    logger.info(f"Saved JSON to {path}")
+    logger.info("Saved JSON to %s", path)
@@ -0,0 +1,79 @@
+import time
+from typing import Dict, NamedTuple
+from .config import cfg
+from .logger import get_logger
+from .replay import replay_mode
+
+
+logger = get_logger(__name__)
+
+
+_WARMUP_TEXT = "Photosynthesis converts light energy into chemical energy stored in glucose."
+
+
+def _warm_encoder():
+    from .semantic import _encode_batch
+    _encode_batch([_WARMUP_TEXT, _WARMUP_TEXT * 4])
+
+
+def _grammar_server_url():
+    return cfg.get("quality", {}).get("languagetool_server_url")
+
+
+def _warm_grammar():
+    # Each check otherwise runs in a throwaway process with its own JVM, so
+    # only a shared server has anything to warm. Raises rather than falling
+    # back to the heuristic, so a broken server fails the step.
+    from .quality import check_languagetool_server
+    check_languagetool_server(_grammar_server_url(), _WARMUP_TEXT)
+
+
+def _warm_vision():
+    from .ocr import _get_client
+    _get_client()
+
+
+_STEPS = {
+    "encoder": _warm_encoder,
+    "grammar": _warm_grammar,
+    "vision": _warm_vision,
+}
+
+# Served from recordings when replaying, so there is nothing to warm.
+_EXTERNAL_STEPS = ("grammar", "vision")
+
+
+class WarmupResult(NamedTuple):
+    timings: Dict[str, float]
+    # Step name -> error, for the steps that raised.
+    failed: Dict[str, str]
+
+
+def warmup() -> WarmupResult:
+    """
+    Load and exercise the grading dependencies selected in the `warmup` config
+    section so the first evaluation does not pay their cold start. Returns the
+    time taken per successful step in seconds and the error of each step that
+    failed; a failing step is logged and the rest still run.
+    """
+    warmup_cfg = cfg.get("warmup", {})
+    timings = {}
+    failed = {}
+    for name, step in _STEPS.items():
+        if not warmup_cfg.get(name, True):
+            continue
+        if name in _EXTERNAL_STEPS and replay_mode() == "replay":
+            continue
+        if name == "grammar" and not _grammar_server_url():
+            logger.info("Skipping grammar warmup: no shared LanguageTool server configured")
+            continue
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.exception("Warmup step '%s' failed", name)
+            failed[name] = str(e) or type(e).__name__
+            continue
+        timings[name] = round(time.perf_counter() - start, 3)
+        logger.info("Warmed up %s in %.2fs", name, timings[name])
+    return WarmupResult(timings, failed)
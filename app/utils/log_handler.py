@@ -0,0 +1,146 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Optional, Tuple
+from app.utils.tracing import RequestIdFilter
+
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+_LISTENER: Optional[QueueListener] = None
+_QUEUE_HANDLER: Optional[QueueHandler] = None
+_HANDLERS: Tuple[logging.Handler, ...] = ()
+
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.access", "uvicorn.error")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request_id, message and exception."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _RecordQueueHandler(QueueHandler):
+    """
+    Enqueues records for the background listener. Only the message merge and
+    traceback rendering happen on the calling thread; formatting and I/O happen
+    on the listener thread. The request ID is captured by RequestIdFilter before
+    the record leaves the caller's context.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Finalised on a copy: other handlers on the same logger (gunicorn's
+        # on uvicorn.access, whose formatter reads record.args) still need
+        # the original.
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+        record = copy.copy(record)
+        record.message = message
+        record.msg, record.args = message, None
+        record.exc_text = exc_text
+        record.exc_info = None
+        record.stack_info = None
+        return record
+
+
+class _ExcludeLoggers(logging.Filter):
+    def __init__(self, *prefixes: str):
+        super().__init__()
+        self.prefixes = prefixes
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not record.name.startswith(self.prefixes)
+
+
+def setup_logging(log_path: str, log_format: str, json_output: bool = False, level: int = logging.INFO) -> QueueHandler:
+    """
+    Route all logging through a queue drained by one background thread, which
+    writes to the daily-rotated `log_path` and to stderr. Returns the queue
+    handler; `attach_uvicorn_loggers` adds it to uvicorn's loggers.
+    """
+    global _LISTENER, _QUEUE_HANDLER, _HANDLERS
+    formatter = JsonFormatter() if json_output else logging.Formatter(log_format)
+
+    file_handler = TimedRotatingFileHandler(log_path, when='midnight', interval=1, backupCount=7, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    file_handler.setLevel(level)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    stream_handler.setLevel(level)
+    # uvicorn prints its own records to the console; they only go to the file here.
+    stream_handler.addFilter(_ExcludeLoggers("uvicorn"))
+
+    _QUEUE_HANDLER = _RecordQueueHandler(queue.SimpleQueue())
+    _QUEUE_HANDLER.addFilter(RequestIdFilter())
+    _HANDLERS = (file_handler, stream_handler)
+    _LISTENER = QueueListener(_QUEUE_HANDLER.queue, *_HANDLERS, respect_handler_level=True)
+    _LISTENER.start()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QUEUE_HANDLER)
+    return _QUEUE_HANDLER
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _LISTENER
+    if _LISTENER is not None:
+        listener, _LISTENER = _LISTENER, None
+        listener.stop()
+
+
+def attach_uvicorn_loggers(level: Optional[int] = None):
+    """
+    Send uvicorn's records to the log file as well. UvicornWorker replaces the
+    handlers of these loggers when gunicorn creates it, so this runs again in
+    each worker (gunicorn.conf.py's post_fork).
+    """
+    if _QUEUE_HANDLER is None:
+        return
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        if _QUEUE_HANDLER not in uvicorn_logger.handlers:
+            uvicorn_logger.addHandler(_QUEUE_HANDLER)
+        if level is not None:
+            uvicorn_logger.setLevel(level)
+        uvicorn_logger.propagate = False
+
+
+def restart_after_fork():
+    """
+    Start this process's own writer thread. Threads do not survive fork(), so
+    a gunicorn worker forked from a master that set up logging calls this from
+    post_fork. Other forks (e.g. quality.py's LanguageTool subprocess) do not
+    need it and are left alone.
+    """
+    global _LISTENER
+    if _LISTENER is None:
+        return
+    fresh = queue.SimpleQueue()
+    _QUEUE_HANDLER.queue = fresh
+    _LISTENER = QueueListener(fresh, *_HANDLERS, respect_handler_level=True)
+    _LISTENER.start()
+
+
+atexit.register(stop_logging)
@@ -1,42 +1,235 @@
-import resend, logging
+import resend, logging, asyncio, hashlib, json, os, random, socket, time, uuid
 import anyio, anyio.to_thread
+from typing import List, Optional
+from app.redis.redis_client import redis_handler
 from env import env
-from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
 
 resend.api_key = env.RESEND_API_KEY
 
+MAIL_FROM = "SmartGrader <hello@smartgrader.online>"
+
 # Custom exception for email sending failures
 class EmailSendingError(Exception):
     pass
 
-# Async send_mail function with retry mechanism
-@retry(
-    stop=stop_after_attempt(3),  # Retry up to 3 times
-    wait=wait_fixed(30),         # Wait 30 seconds between retries
-    retry=retry_if_exception_type(Exception),  # Retry on any exception
-    before=lambda retry_state: logging.warning(
-        "Retrying email send attempt %d...", retry_state.attempt_number
-    ),
-    after=lambda retry_state: logging.error(
-        "Failed after %d attempts", retry_state.attempt_number
-    ) if retry_state.outcome.failed else None
-)
-async def send_mail(contacts: list, subject: str, message: str) -> resend.Email:
+
+# Outbox. Requests enqueue mail in Redis and return; a background sender in
+# each worker delivers it in batches, retrying with exponential backoff and
+# moving mail that keeps failing to a dead-letter list.
+#
+#   mail:outbox               LPUSH by enqueue_mail, consumed from the right
+#   mail:processing:<sender>  batch a sender has claimed but not finished
+#   mail:sender:<sender>      heartbeat; once it expires the claimed batch is requeued
+#   mail:retry                zset of failed mail, scored by when to retry
+#   mail:dead                 mail that failed MAIL_MAX_ATTEMPTS times
+OUTBOX_KEY = "mail:outbox"
+PROCESSING_PREFIX = "mail:processing:"
+HEARTBEAT_PREFIX = "mail:sender:"
+RETRY_KEY = "mail:retry"
+DEAD_LETTER_KEY = "mail:dead"
+
+MAIL_BATCH_SIZE = 50            # Resend accepts up to 100 per batch call
+MAIL_MAX_ATTEMPTS = 6
+MAIL_BACKOFF_BASE_SECONDS = 5
+MAIL_BACKOFF_MAX_SECONDS = 900
+HEARTBEAT_TTL_SECONDS = 60
+RECOVERY_INTERVAL_SECONDS = 30
+
+# Moves retries that are due back onto the outbox.
+_PROMOTE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, item in ipairs(due) do
+    redis.call('ZREM', KEYS[1], item)
+    redis.call('RPUSH', KEYS[2], item)
+end
+return #due
+"""
+
+# Requeues a dead sender's claimed batch, unless its heartbeat is still alive.
+_RECOVER_PROCESSING = """
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    return 0
+end
+local moved = 0
+while redis.call('LMOVE', KEYS[1], KEYS[2], 'LEFT', 'RIGHT') do
+    moved = moved + 1
+end
+return moved
+"""
+
+
+def _send_params(mail: dict) -> dict:
+    return {"from": MAIL_FROM, "to": mail["to"], "subject": mail["subject"], "html": mail["html"]}
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(MAIL_BACKOFF_MAX_SECONDS, MAIL_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def enqueue_mail(contacts: list, subject: str, message: str) -> str:
     """
-    Asynchronously send an email with retry mechanism.
-    Raises EmailSendingError if all retries fail.
+    Queue an email for the background sender and return its id. Call it after
+    the surrounding transaction has committed.
     """
-    params: resend.Emails.SendParams = {
-        "from": "SmartGrader <hello@smartgrader.online>",
+    redis_client = await redis_handler.get_client()
+    if redis_client is None:
+        raise EmailSendingError("Mail outbox unavailable: no Redis connection")
+    mail_id = uuid.uuid4().hex
+    item = json.dumps({
+        "id": mail_id,
         "to": contacts,
         "subject": subject,
         "html": message,
-    }
-    try:
-        # Run synchronous resend.Emails.send in a thread
-        email: resend.Email = await anyio.to_thread.run_sync(lambda: resend.Emails.send(params))
-        logging.info("Email sent successfully to %s", contacts)
-        return email
-    except Exception as e:
-        logging.error("Failed to send email to %s: %s", contacts, str(e))
-        raise EmailSendingError(f"Failed to send email: {str(e)}")
+        "attempts": 0,
+        "queued_at": time.time(),
+    })
+    await redis_client.lpush(OUTBOX_KEY, item)
+    logging.info("Queued email %s to %s", mail_id, contacts)
+    return mail_id
+
+
+class MailSender:
+    """Per-worker background task that drains the mail outbox."""
+
+    def __init__(self):
+        # Assigned in start(): the instance is created at import time, which
+        # under preload_app is in the gunicorn master, before the fork.
+        self.sender_id: Optional[str] = None
+        self.processing_key: Optional[str] = None
+        self.heartbeat_key: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def _claim(self, redis_client) -> List[str]:
+        # Block briefly for the first item, then take whatever else is queued.
+        first = await redis_client.blmove(OUTBOX_KEY, self.processing_key, 1, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        batch = [first]
+        while len(batch) < MAIL_BATCH_SIZE:
+            item = await redis_client.lmove(OUTBOX_KEY, self.processing_key, "RIGHT", "LEFT")
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    async def _beat(self, redis_client):
+        await redis_client.setex(self.heartbeat_key, HEARTBEAT_TTL_SECONDS, "1")
+
+    async def _deliver(self, redis_client, batch: List[str]):
+        mails = []
+        for raw in batch:
+            try:
+                mails.append((raw, json.loads(raw)))
+            except ValueError:
+                logging.error("Dropping malformed outbox entry to the dead-letter list: %.200s", raw)
+                await redis_client.lpush(DEAD_LETTER_KEY, raw)
+
+        params = [_send_params(mail) for _, mail in mails]
+        # The same mails always get the same key, so a batch retried after a
+        # lost response is not sent twice.
+        batch_ids = ",".join(sorted(mail["id"] for _, mail in mails))
+        options = {"idempotency_key": "batch-" + hashlib.sha256(batch_ids.encode()).hexdigest()}
+        failed = []
+        if params:
+            try:
+                # Refreshed before every send: a failed batch followed by one
+                # send per mail can outlast the TTL, and another worker would
+                # then requeue this batch and send it again.
+                await self._beat(redis_client)
+                await anyio.to_thread.run_sync(lambda: resend.Batch.send(params, options))
+                logging.info("Sent %d queued emails", len(params))
+            except Exception as e:
+                logging.warning("Batch of %d emails failed (%s); sending them one by one", len(params), e)
+                # One bad recipient fails the whole batch call, so only the
+                # mails that also fail on their own are retried later.
+                for _, mail in mails:
+                    try:
+                        await self._beat(redis_client)
+                        await anyio.to_thread.run_sync(
+                            lambda: resend.Emails.send(_send_params(mail), {"idempotency_key": "mail-" + mail["id"]})
+                        )
+                    except Exception as single_error:
+                        logging.error("Failed to send email %s to %s: %s", mail["id"], mail["to"], single_error)
+                        failed.append((mail, single_error))
+                logging.info("Sent %d of %d emails individually", len(mails) - len(failed), len(mails))
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            now = time.time()
+            for mail, error in failed:
+                mail["attempts"] += 1
+                mail["last_error"] = str(error)[:500]
+                if mail["attempts"] >= MAIL_MAX_ATTEMPTS:
+                    logging.error("Email %s to %s dead-lettered after %d attempts", mail["id"], mail["to"], mail["attempts"])
+                    pipe.lpush(DEAD_LETTER_KEY, json.dumps(mail))
+                else:
+                    pipe.zadd(RETRY_KEY, {json.dumps(mail): now + _backoff(mail["attempts"])})
+            pipe.delete(self.processing_key)
+            await pipe.execute()
+
+    async def _recover(self, redis_client):
+        async for key in redis_client.scan_iter(match=PROCESSING_PREFIX + "*", count=100):
+            sender_id = key[len(PROCESSING_PREFIX):]
+            if sender_id == self.sender_id:
+                continue
+            moved = await redis_client.eval(_RECOVER_PROCESSING, 3, key, OUTBOX_KEY, HEARTBEAT_PREFIX + sender_id)
+            if moved:
+                logging.warning("Requeued %d emails claimed by stopped sender %s", moved, sender_id)
+
+    async def _run(self):
+        next_recovery = 0.0
+        while not self._stopping:
+            try:
+                redis_client = await redis_handler.get_client()
+                if redis_client is None:
+                    await asyncio.sleep(5)
+                    continue
+                await self._beat(redis_client)
+
+                # A batch left over from an interrupted send goes out first.
+                leftover = await redis_client.lrange(self.processing_key, 0, -1)
+                if leftover:
+                    await self._deliver(redis_client, leftover)
+
+                if time.monotonic() >= next_recovery:
+                    await self._recover(redis_client)
+                    next_recovery = time.monotonic() + RECOVERY_INTERVAL_SECONDS
+                await redis_client.eval(_PROMOTE_DUE, 2, RETRY_KEY, OUTBOX_KEY, time.time(), MAIL_BATCH_SIZE)
+
+                batch = await self._claim(redis_client)
+                if batch:
+                    await self._deliver(redis_client, batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("Mail sender error: %s", e, exc_info=True)
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self.sender_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            self.processing_key = PROCESSING_PREFIX + self.sender_id
+            self.heartbeat_key = HEARTBEAT_PREFIX + self.sender_id
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Let an in-flight batch finish, then stop. Unsent mail stays queued."""
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self._task = None
+        try:
+            redis_client = await redis_handler.get_client()
+            if redis_client is not None:
+                await redis_client.delete(self.heartbeat_key)
+        except Exception as e:
+            logging.warning("Failed to clear mail sender heartbeat: %s", e)
+
+
+mail_sender = MailSender()
@@ -0,0 +1,143 @@
+import gc
+import os
+import resource
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+from env import env
+
+
+MAX_SNAPSHOTS = 8
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_SNAPSHOTS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+class SnapshotInOtherWorker(LookupError):
+    """The snapshot id belongs to another worker process, which is the only one holding it."""
+
+    def __init__(self, snapshot_id: str, pid: int):
+        super().__init__(snapshot_id)
+        self.snapshot_id = snapshot_id
+        self.pid = pid
+
+
+def _snapshot_pid(snapshot_id: str) -> Optional[int]:
+    pid, _, _ = snapshot_id.partition("-")
+    return int(pid) if pid.isdigit() else None
+
+
+def tracking_enabled() -> bool:
+    """Per-stage memory deltas are opt-in (SG_MEMORY_TRACKING=1): tracemalloc slows allocation."""
+    return tracemalloc.is_tracing()
+
+
+def start_tracking():
+    if env.MEMORY_TRACKING in ("1", "true", "yes") and not tracemalloc.is_tracing():
+        tracemalloc.start(int(env.TRACEMALLOC_FRAMES))
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def sample() -> Dict[str, int]:
+    traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    return {"rss": current_rss(), "traced": traced}
+
+
+def _object_counts() -> Counter:
+    """Live objects tracked by the garbage collector, per type name."""
+    return Counter(type(o).__name__ for o in gc.get_objects())
+
+
+def take_snapshot(limit: int = 25) -> Dict[str, Any]:
+    """
+    Record RSS, live object counts per type and (when tracing) a tracemalloc
+    snapshot. The newest MAX_SNAPSHOTS are kept in memory for `diff_snapshots`.
+
+    Snapshots live in the worker process that took them; under several
+    gunicorn workers a diff only works when it reaches the same worker. The
+    id starts with that worker's pid so a miss can say where the snapshot is.
+    """
+    gc.collect()
+    snapshot_id = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+    entry = {
+        "id": snapshot_id,
+        "pid": os.getpid(),
+        "taken_at": time.time(),
+        "rss": current_rss(),
+        "objects": _object_counts(),
+        "tracemalloc": tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None,
+    }
+    with _LOCK:
+        _SNAPSHOTS[snapshot_id] = entry
+        while len(_SNAPSHOTS) > MAX_SNAPSHOTS:
+            _SNAPSHOTS.popitem(last=False)
+    return summarize(entry, limit)
+
+
+def summarize(entry: Dict[str, Any], limit: int = 25) -> Dict[str, Any]:
+    summary = {k: entry[k] for k in ("id", "pid", "taken_at", "rss")}
+    summary["objects"] = dict(entry["objects"].most_common(limit))
+    snap = entry["tracemalloc"]
+    if snap is not None:
+        summary["top_allocations"] = [
+            {"location": str(stat.traceback), "size": stat.size, "count": stat.count}
+            for stat in snap.statistics("lineno")[:limit]
+        ]
+    return summary
+
+
+def list_snapshots() -> List[Dict[str, Any]]:
+    with _LOCK:
+        return [{"id": e["id"], "pid": e["pid"], "taken_at": e["taken_at"], "rss": e["rss"]} for e in _SNAPSHOTS.values()]
+
+
+def diff_snapshots(base_id: str, target_id: Optional[str] = None, limit: int = 25) -> Dict[str, Any]:
+    """
+    Compare two snapshots (the target defaults to a fresh one): RSS change,
+    object count changes and the tracemalloc lines whose retained size grew most.
+    Raises SnapshotInOtherWorker for a snapshot taken by another worker and
+    KeyError for an unknown (or evicted) one.
+    """
+    for snapshot_id in (base_id, target_id):
+        pid = _snapshot_pid(snapshot_id) if snapshot_id else None
+        if pid is not None and pid != os.getpid():
+            raise SnapshotInOtherWorker(snapshot_id, pid)
+    with _LOCK:
+        base = _SNAPSHOTS.get(base_id)
+    if base is None:
+        raise KeyError(base_id)
+    if target_id is None:
+        target_id = take_snapshot(limit)["id"]
+    with _LOCK:
+        target = _SNAPSHOTS.get(target_id)
+    if target is None:
+        raise KeyError(target_id)
+
+    types = set(base["objects"]) | set(target["objects"])
+    objects = {t: target["objects"].get(t, 0) - base["objects"].get(t, 0) for t in types}
+    diff = {
+        "base": base_id,
+        "target": target_id,
+        "seconds": target["taken_at"] - base["taken_at"],
+        "rss_delta": target["rss"] - base["rss"],
+        "object_deltas": dict(sorted(objects.items(), key=lambda kv: -abs(kv[1]))[:limit]),
+    }
+    if base["tracemalloc"] is not None and target["tracemalloc"] is not None:
+        stats = target["tracemalloc"].compare_to(base["tracemalloc"], "lineno")
+        diff["top_growth"] = [
+            {"location": str(stat.traceback), "size_delta": stat.size_diff, "count_delta": stat.count_diff, "size": stat.size}
+            for stat in stats[:limit]
+        ]
+    return diff
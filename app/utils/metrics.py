@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from app.utils import memory
+
+
+ENCODER_BATCH_SIZE = Histogram(
+    "smartgrader_encoder_batch_size",
+    "Number of texts encoded per coalesced encoder forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+ENCODER_QUEUE_WAIT_SECONDS = Histogram(
+    "smartgrader_encoder_queue_wait_seconds",
+    "Time an encode request waited in the encoder service queue",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+STAGE_SECONDS = Histogram(
+    "smartgrader_stage_seconds",
+    "Time spent in each grading pipeline stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+
+PAGES_PROCESSED = Counter(
+    "smartgrader_pages_processed",
+    "Answer sheet pages rasterized and OCR'd",
+)
+
+QUESTIONS_SCORED = Counter(
+    "smartgrader_questions_scored",
+    "Student answers scored against a model answer",
+)
+
+FALLBACKS = Counter(
+    "smartgrader_fallbacks",
+    "Times a grading component fell back to a cheaper implementation",
+    ["component", "reason"],
+)
+
+# Net memory change attributed to each stage, accumulated over the process
+# lifetime. A stage whose value keeps climbing is retaining memory. Only
+# recorded when memory tracking is enabled (SG_MEMORY_TRACKING=1).
+STAGE_RSS_BYTES = Gauge(
+    "smartgrader_stage_rss_net_bytes",
+    "Cumulative RSS change across runs of each grading stage",
+    ["stage"],
+    multiprocess_mode="livesum",
+)
+
+STAGE_TRACED_BYTES = Gauge(
+    "smartgrader_stage_traced_net_bytes",
+    "Cumulative tracemalloc-traced allocation change across runs of each grading stage",
+    ["stage"],
+    multiprocess_mode="livesum",
+)
+
+CACHE_REQUESTS = Counter(
+    "smartgrader_cache_requests",
+    "Cache lookups by cache and outcome (hit/miss)",
+    ["cache", "result"],
+)
+
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "smartgrader_password_hash_queue_depth",
+    "bcrypt operations waiting for a password hashing worker",
+    multiprocess_mode="livesum",
+)
+
+PASSWORD_HASH_WAIT_SECONDS = Histogram(
+    "smartgrader_password_hash_wait_seconds",
+    "Time a bcrypt operation waited for a password hashing worker",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "smartgrader_password_hash_seconds",
+    "Time spent in bcrypt by operation (hash/verify)",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+PASSWORD_REHASHES = Counter(
+    "smartgrader_password_rehashes",
+    "Stored password hashes upgraded on login after the bcrypt cost changed",
+)
+
+RATE_LIMIT_DECISIONS = Counter(
+    "smartgrader_rate_limit_decisions",
+    "Rate limiter decisions by policy and result (allowed/limited/error)",
+    ["policy", "result"],
+)
+
+RATE_LIMIT_CHECK_SECONDS = Histogram(
+    "smartgrader_rate_limit_check_seconds",
+    "Time spent checking a request against its rate limit",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 0.25),
+)
+
+
+# Per-request stage breakdown. The dict is shared by every context copied from
+# the request's context, so stages running in worker threads add to it too.
+_TIMINGS: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+_TIMINGS_LOCK = threading.Lock()
+
+
+def start_timings() -> Dict[str, float]:
+    """
+    Start collecting a stage breakdown for the current context (normally one
+    request's task) and return the dict that `stage_timer` will fill in.
+    Stages that run concurrently are summed, so the values are busy time
+    rather than wall time.
+    """
+    timings: Dict[str, float] = {}
+    _TIMINGS.set(timings)
+    return timings
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time a block (or, used as a decorator, a function) as pipeline `stage`."""
+    before = memory.sample() if memory.tracking_enabled() else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        if before is not None:
+            after = memory.sample()
+            STAGE_RSS_BYTES.labels(stage).inc(after["rss"] - before["rss"])
+            STAGE_TRACED_BYTES.labels(stage).inc(after["traced"] - before["traced"])
+        timings = _TIMINGS.get()
+        if timings is not None:
+            with _TIMINGS_LOCK:
+                timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Serialise all metrics in the Prometheus text format. Under gunicorn with
+    PROMETHEUS_MULTIPROC_DIR set, samples from every worker are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,81 @@
+import time
+from typing import Callable, Optional, Tuple, TypeVar
+import anyio
+import anyio.to_thread
+from passlib.context import CryptContext
+from app.utils.metrics import (
+    PASSWORD_HASH_QUEUE_DEPTH,
+    PASSWORD_HASH_SECONDS,
+    PASSWORD_HASH_WAIT_SECONDS,
+    PASSWORD_REHASHES,
+)
+from env import env
+
+
+T = TypeVar("T")
+
+BCRYPT_ROUNDS = int(env.BCRYPT_ROUNDS)
+
+# Pinning min and max to the configured cost makes passlib flag any stored
+# hash with a different cost, in either direction, for an upgrade on login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_LIMITER: Optional[anyio.CapacityLimiter] = None
+
+
+def _limiter() -> anyio.CapacityLimiter:
+    # bcrypt releases the GIL, so a few threads hash in parallel. The limiter
+    # keeps a login burst from taking every thread anyio has for other work.
+    global _LIMITER
+    if _LIMITER is None:
+        _LIMITER = anyio.CapacityLimiter(max(1, int(env.BCRYPT_WORKERS)))
+    return _LIMITER
+
+
+async def _offload(operation: str, fn: Callable[..., T], *args) -> T:
+    queued_at = time.perf_counter()
+    started = False
+    PASSWORD_HASH_QUEUE_DEPTH.inc()
+
+    def run() -> T:
+        nonlocal started
+        start = time.perf_counter()
+        started = True
+        PASSWORD_HASH_QUEUE_DEPTH.dec()
+        PASSWORD_HASH_WAIT_SECONDS.observe(start - queued_at)
+        try:
+            return fn(*args)
+        finally:
+            PASSWORD_HASH_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+    try:
+        return await anyio.to_thread.run_sync(run, limiter=_limiter())
+    finally:
+        # Cancelled before a worker picked it up: it never left the queue.
+        if not started:
+            PASSWORD_HASH_QUEUE_DEPTH.dec()
+
+
+async def hash_password(password: str) -> str:
+    return await _offload("hash", pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await _offload("verify", pwd_context.verify, password, hashed_password)
+
+
+async def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password and, when the stored hash uses a different bcrypt cost
+    than SG_BCRYPT_ROUNDS, also return a fresh hash to store in its place.
+    """
+    valid, new_hash = await _offload("verify", pwd_context.verify_and_update, password, hashed_password)
+    if valid and new_hash:
+        PASSWORD_REHASHES.inc()
+    return valid, new_hash
@@ -0,0 +1,200 @@
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+import anyio.to_thread
+from collections import Counter
+from typing import Dict, Optional
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from app.api.v1.user.auth.routes.user import get_current_admin, get_current_user
+from app.db.prisma_client import get_prisma
+from env import env
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+DEFAULT_INTERVAL_MS = 10
+MIN_INTERVAL_MS = 5
+MAX_INTERVAL_MS = 100
+MAX_DURATION_SECONDS = 120
+MAX_STACK_DEPTH = 96
+
+_ACTIVE = threading.Lock()
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that periodically samples the stacks of every other
+    thread via `sys._current_frames()`, so work that a request hands to worker
+    threads (grading executor, encoder service) is captured too. Samples are
+    kept as collapsed stacks ("thread;outer;...;inner count"), the input format
+    of flamegraph.pl and speedscope.
+
+    Overhead is bounded by the sampling interval (clamped to
+    MIN_INTERVAL_MS..MAX_INTERVAL_MS), a stack depth cap and a hard
+    `max_duration` after which sampling stops on its own.
+    """
+
+    def __init__(self, interval_ms: float = DEFAULT_INTERVAL_MS, max_duration: float = MAX_DURATION_SECONDS):
+        self.interval = min(max(float(interval_ms), MIN_INTERVAL_MS), MAX_INTERVAL_MS) / 1000.0
+        self.max_duration = min(max(float(max_duration), 0.0), MAX_DURATION_SECONDS)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.max_duration
+        names = {}
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if frames.keys() - names.keys():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _profile_dir() -> str:
+    path = os.path.join(env.LOG_DIR or ".", "profiles")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _error_response(exc: HTTPException) -> JSONResponse:
+    # Same body as the app's HTTPException handler, which does not run out here.
+    return JSONResponse(status_code=exc.status_code, content={"success": False, "message": str(exc.detail)})
+
+
+async def _authorize(request: Request):
+    """Raises HTTPException unless the request carries an admin bearer token."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Profiling requires an admin token")
+    credentials = HTTPAuthorizationCredentials(scheme=scheme, credentials=token.strip())
+    await get_current_admin(await get_current_user(credentials, await get_prisma()))
+
+
+def _finish(profiler: SamplingProfiler, profile_id: str) -> Optional[str]:
+    """Stop sampling and write the profile; returns its path, or None if it could not be written."""
+    try:
+        profiler.stop()
+    finally:
+        _ACTIVE.release()
+    path = os.path.join(_profile_dir(), f"{profile_id}.folded")
+    try:
+        profiler.write(path)
+        return path
+    except OSError:
+        logger.exception("Failed to write profile %s", profile_id)
+        return None
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware: when a request carries `X-Profile: 1` (or
+    `?profile=1`) and an admin bearer token, it runs under the sampling
+    profiler. The collapsed stacks are written to LOG_DIR/profiles/<id>.folded
+    and the id is returned in the X-Profile-Id header. `profile_interval_ms`
+    tunes the sampling rate. Only one profile runs per process at a time.
+    Requests without the flag pass straight through; the token is only
+    checked when profiling is asked for.
+
+    The profile covers the whole worker process, not just this request:
+    every thread is sampled, so other requests served concurrently by the
+    same worker show up too. Each stack is rooted at its thread's name
+    (e.g. MainThread for the event loop, AnyIO worker threads, the grading
+    executor), which is how to tell them apart; profile on an otherwise idle
+    worker for a clean picture.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        flag = request.headers.get(PROFILE_HEADER) or request.query_params.get("profile")
+        if flag not in ("1", "true", "yes"):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await _authorize(request)
+        except HTTPException as e:
+            await _error_response(e)(scope, receive, send)
+            return
+
+        if not _ACTIVE.acquire(blocking=False):
+            await _error_response(
+                HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+            )(scope, receive, send)
+            return
+
+        try:
+            interval_ms = float(request.query_params.get("profile_interval_ms", DEFAULT_INTERVAL_MS))
+        except ValueError:
+            interval_ms = DEFAULT_INTERVAL_MS
+        if not math.isfinite(interval_ms):
+            interval_ms = DEFAULT_INTERVAL_MS
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        profiler = SamplingProfiler(interval_ms)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER.encode(), profile_id.encode())]
+            await send(message)
+
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            # Joining the sampler and writing the file happen off the event loop.
+            path = await anyio.to_thread.run_sync(_finish, profiler, profile_id)
+            if path is not None:
+                logger.info(
+                    "Profile %s of %s %s: %d samples over %.2fs written to %s",
+                    profile_id, scope["method"], scope["path"], profiler.samples, time.perf_counter() - started, path
+                )
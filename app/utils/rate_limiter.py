@@ -0,0 +1,218 @@
+import asyncio
+import functools
+import logging
+import math
+import time
+from typing import NamedTuple, Optional
+from jose import jwt, JWTError
+from starlette.requests import Request
+from app.redis.redis_client import redis_handler
+from app.utils.error_handler import TooManyRequestsError, too_many_requests_response
+from app.utils.metrics import RATE_LIMIT_CHECK_SECONDS, RATE_LIMIT_DECISIONS
+from env import env
+
+
+logger = logging.getLogger(__name__)
+
+
+class RatePolicy(NamedTuple):
+    """A token bucket: up to `capacity` at once, refilled at `refill_per_second`."""
+    name: str
+    capacity: float
+    refill_per_second: float
+    # "user" keys on the user id in a valid bearer token, falling back to the
+    # client IP; "ip" always keys on the client IP.
+    key: str = "user"
+
+
+DEFAULT_POLICY = RatePolicy("default", capacity=120, refill_per_second=10)
+LOGIN_POLICY = RatePolicy("login", capacity=10, refill_per_second=10 / 60, key="ip")
+OTP_POLICY = RatePolicy("otp", capacity=10, refill_per_second=10 / 600, key="ip")
+EVALUATE_POLICY = RatePolicy("evaluate", capacity=5, refill_per_second=1 / 20)
+# Charged by the evaluation routes once they know how many pages were uploaded.
+EVALUATE_PAGES_POLICY = RatePolicy("evaluate_pages", capacity=100, refill_per_second=200 / 3600)
+
+ROUTE_POLICIES = {
+    ("POST", "/api/v1/login"): LOGIN_POLICY,
+    ("POST", "/api/v1/register"): OTP_POLICY,
+    ("PUT", "/api/v1/verify/otp"): OTP_POLICY,
+    ("POST", "/api/v1/resend-otp"): OTP_POLICY,
+    ("POST", "/api/v1/reset-password"): OTP_POLICY,
+    ("POST", "/api/v1/restore-account"): LOGIN_POLICY,
+    ("POST", "/api/v1/restore-account/google"): LOGIN_POLICY,
+    ("POST", "/api/v1/evaluate"): EVALUATE_POLICY,
+    ("POST", "/api/v1/evaluate/cohort"): EVALUATE_POLICY,
+}
+PREFIX_POLICIES = (
+    ("POST", "/api/v1/forgot-password/", OTP_POLICY),
+)
+EXEMPT_PATHS = frozenset({"/", "/ready", "/metrics", "/docs", "/redoc", "/openapi.json"})
+
+# A slow Redis must not slow every request down; past this the request is let through.
+CHECK_TIMEOUT_SECONDS = 0.25
+
+# KEYS: bucket. ARGV: capacity, refill per second, cost.
+# A cost above the capacity is admitted once the bucket is full and leaves it
+# in debt, so large jobs are slowed down rather than refused forever.
+_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local needed = math.min(cost, capacity)
+local allowed = 0
+local retry_after = 0
+if tokens >= needed then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (needed - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - math.min(tokens, 0)) / rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+_SCRIPT = None
+_LAST_FAILURE_LOG = 0.0
+
+
+class RateDecision(NamedTuple):
+    allowed: bool
+    remaining: float
+    retry_after: float
+
+
+def enabled() -> bool:
+    return env.RATE_LIMIT.lower() not in ("0", "false", "no", "off")
+
+
+def policy_for(method: str, path: str) -> Optional[RatePolicy]:
+    """The policy for a request, or None if the path is not limited."""
+    if path in EXEMPT_PATHS:
+        return None
+    policy = ROUTE_POLICIES.get((method, path.rstrip("/") or "/"))
+    if policy is not None:
+        return policy
+    for prefix_method, prefix, prefix_policy in PREFIX_POLICIES:
+        if method == prefix_method and path.startswith(prefix):
+            return prefix_policy
+    return DEFAULT_POLICY
+
+
+@functools.lru_cache(maxsize=4096)
+def _user_id_from_token(token: str) -> Optional[str]:
+    # Signature only: an expired token still identifies who is asking, and
+    # the route itself rejects it. Cached so repeat callers skip the HMAC.
+    try:
+        payload = jwt.decode(token, env.JWT_SECRET_KEY, algorithms=["HS256"], options={"verify_exp": False})
+    except JWTError:
+        return None
+    user_id = payload.get("id")
+    return str(user_id) if user_id else None
+
+
+def identity_for(scope, policy: RatePolicy) -> str:
+    if policy.key == "user":
+        for name, value in scope.get("headers") or ():
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    user_id = _user_id_from_token(token.strip())
+                    if user_id:
+                        return f"user:{user_id}"
+                break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def _log_failure(e: Exception):
+    global _LAST_FAILURE_LOG
+    now = time.monotonic()
+    if now - _LAST_FAILURE_LOG > 60:
+        _LAST_FAILURE_LOG = now
+        logger.warning("Rate limiter unavailable, letting requests through: %s", e)
+
+
+async def take(policy: RatePolicy, identity: str, cost: float = 1) -> RateDecision:
+    """
+    Take `cost` tokens from the bucket for `policy` and `identity`. Fails open:
+    if Redis is unreachable or slow the request is allowed.
+    """
+    global _SCRIPT
+    start = time.perf_counter()
+    try:
+        redis_client = redis_handler.client
+        if redis_client is None:
+            raise ConnectionError("no Redis connection")
+        if _SCRIPT is None:
+            _SCRIPT = redis_client.register_script(_TOKEN_BUCKET)
+        allowed, remaining, retry_after = await asyncio.wait_for(
+            _SCRIPT(keys=[f"ratelimit:{policy.name}:{identity}"],
+                    args=[policy.capacity, policy.refill_per_second, cost],
+                    client=redis_client),
+            CHECK_TIMEOUT_SECONDS,
+        )
+        decision = RateDecision(bool(allowed), float(remaining), float(retry_after))
+        RATE_LIMIT_DECISIONS.labels(policy.name, "allowed" if decision.allowed else "limited").inc()
+        return decision
+    except Exception as e:
+        _log_failure(e)
+        RATE_LIMIT_DECISIONS.labels(policy.name, "error").inc()
+        return RateDecision(True, policy.capacity, 0.0)
+    finally:
+        RATE_LIMIT_CHECK_SECONDS.observe(time.perf_counter() - start)
+
+
+def _limited_error(policy: RatePolicy, decision: RateDecision) -> TooManyRequestsError:
+    return TooManyRequestsError(
+        f"Rate limit exceeded for {policy.name}, retry in {max(1, math.ceil(decision.retry_after))}s",
+        retry_after=decision.retry_after,
+    )
+
+
+async def charge(request: Request, policy: RatePolicy, cost: float):
+    """
+    Charge an extra, request-specific cost (e.g. pages uploaded) from inside a
+    route. Raises TooManyRequestsError if the caller is over the limit.
+    """
+    if not enabled() or cost <= 0:
+        return
+    decision = await take(policy, identity_for(request.scope, policy), cost)
+    if not decision.allowed:
+        raise _limited_error(policy, decision)
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware admitting each request against its route's token
+    bucket in Redis (one script call). Rejected requests get the standard 429
+    error body with a Retry-After header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not enabled():
+            await self.app(scope, receive, send)
+            return
+
+        policy = policy_for(scope["method"], scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        decision = await take(policy, identity_for(scope, policy))
+        if not decision.allowed:
+            # Exception handlers only run inside the app, so the handler's
+            # response is sent from here directly.
+            response = too_many_requests_response(_limited_error(policy, decision))
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,174 @@
+"""
+Request tracing.
+
+Spans use the OpenTelemetry API when the SDK is installed and tracing is
+enabled with SG_TRACE_EXPORTER:
+  - "none":    tracing disabled (default); `span()` is a no-op
+  - "console": finished spans are printed to stdout
+  - "file":    finished spans are appended as JSON lines to SG_TRACE_FILE
+               (default: <SG_LOG_DIR>/traces.jsonl)
+
+No collector is needed. Every span carries the request ID, which is also
+added to log records by `RequestIdFilter`.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Optional, Sequence
+from env import env
+
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "x-request-id"
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_TRACER = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds `request_id` to every record so it can be used in the log format."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+def _file_exporter(path: str):
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class JsonFileSpanExporter(SpanExporter):
+        def __init__(self):
+            self._lock = threading.Lock()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        def export(self, spans):
+            lines = [json.dumps(json.loads(s.to_json()), separators=(",", ":")) for s in spans]
+            with self._lock, open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+    return JsonFileSpanExporter()
+
+
+def setup_tracing(service_name: str = "smartgrader-backend"):
+    """Configure the tracer provider once per process from SG_TRACE_EXPORTER."""
+    global _TRACER
+    exporter_name = (env.TRACE_EXPORTER or "none").lower()
+    if _TRACER is not None or exporter_name == "none":
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        logger.warning("SG_TRACE_EXPORTER=%s but opentelemetry-sdk is not installed; tracing disabled", exporter_name)
+        return
+
+    if exporter_name == "console":
+        exporter = ConsoleSpanExporter()
+    elif exporter_name == "file":
+        exporter = _file_exporter(env.TRACE_FILE or os.path.join(env.LOG_DIR or ".", "traces.jsonl"))
+    else:
+        logger.warning("Unknown SG_TRACE_EXPORTER %r; tracing disabled", exporter_name)
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name, "process.pid": os.getpid()}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _TRACER = trace.get_tracer("smartgrader")
+    logger.info("Tracing enabled (%s exporter)", exporter_name)
+
+
+def shutdown_tracing():
+    if _TRACER is None:
+        return
+    from opentelemetry import trace
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+
+def current_span_context():
+    """The active span's context, for linking work done on another thread."""
+    if _TRACER is None:
+        return None
+    from opentelemetry import trace
+    context = trace.get_current_span().get_span_context()
+    return context if context.is_valid else None
+
+
+def set_span_attribute(key: str, value: Any):
+    if _TRACER is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().set_attribute(key, value)
+
+
+def span(name: str, links: Sequence[Any] = (), **attributes):
+    """
+    Context manager recording a span named `name`. Costs a single check when
+    tracing is disabled.
+    """
+    if _TRACER is None:
+        return nullcontext()
+    return _span(name, links, attributes)
+
+
+@contextmanager
+def _span(name: str, links: Sequence[Any], attributes: dict):
+    from opentelemetry.trace import Link
+    request_id = request_id_var.get()
+    if request_id:
+        attributes["request.id"] = request_id
+    with _TRACER.start_as_current_span(
+        name,
+        attributes={k: v for k, v in attributes.items() if v is not None},
+        links=[Link(c) for c in links if c is not None],
+    ) as current:
+        yield current
+
+
+class RequestIdMiddleware:
+    """
+    Pure ASGI middleware: assigns each HTTP request an ID (reusing a sane
+    incoming X-Request-ID), echoes it in the response and opens the root span.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")
+        request_id = incoming if incoming and len(incoming) <= 128 and incoming.isprintable() else uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER.encode(), request_id.encode())]
+            await send(message)
+
+        try:
+            if current_span_context() is not None:
+                # The server already opened a request span (FastAPI does when
+                # OpenTelemetry is configured); tag it rather than nesting another.
+                set_span_attribute("request.id", request_id)
+                await self.app(scope, receive, send_with_request_id)
+            else:
+                with span(f"{scope['method']} {scope['path']}", **{"http.method": scope["method"], "http.target": scope["path"]}):
+                    await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
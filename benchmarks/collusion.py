@@ -0,0 +1,68 @@
+"""
+Benchmark blocked all-pairs collusion detection at cohort scale.
+
+    python -m benchmarks.collusion --students 1000 --questions 20 --block-size 256
+
+Plants a few near-duplicate answers in random unit embeddings, then times
+`detect_collusion` and measures its peak NumPy allocation with tracemalloc.
+Exits non-zero if a planted pair is missed or the peak exceeds the memory
+ceiling: one block buffer and mask plus one contiguous question slice.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+import numpy as np
+from app.utils.grading.collusion import detect_collusion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--block-size", type=int, default=256)
+    parser.add_argument("--threshold", type=float, default=0.92)
+    parser.add_argument("--planted", type=int, default=10)
+    parser.add_argument("--slack-mb", type=float, default=8.0, help="allowance for index arrays and the pair list")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    embeddings = rng.standard_normal((args.students, args.questions, args.dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=2, keepdims=True)
+
+    planted = set()
+    for _ in range(args.planted):
+        a, b = sorted(rng.choice(args.students, size=2, replace=False).tolist())
+        q = int(rng.integers(args.questions))
+        noisy = embeddings[a, q] + 0.01 * rng.standard_normal(args.dim, dtype=np.float32)
+        embeddings[b, q] = noisy / np.linalg.norm(noisy)
+        planted.add((q, a, b))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    flagged = detect_collusion(embeddings, list(range(args.questions)), args.threshold, args.block_size)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    block = min(args.block_size, args.students)
+    ceiling = block * block * 5 + args.students * args.dim * 4 + args.slack_mb * 2 ** 20
+    found = {(p["question_id"], p["student_a"], p["student_b"]) for p in flagged}
+    missed = planted - found
+    comparisons = args.questions * args.students * (args.students - 1) // 2
+
+    print(f"{args.students} students x {args.questions} questions, dim {args.dim}, block {args.block_size}")
+    print(f"time           : {elapsed:.3f} s ({comparisons / elapsed / 1e6:.1f} M pairs/s)")
+    print(f"peak memory    : {peak / 2 ** 20:.1f} MiB (ceiling {ceiling / 2 ** 20:.1f} MiB, "
+          f"full matrix would be {args.students ** 2 * 4 / 2 ** 20:.1f} MiB per question)")
+    print(f"flagged pairs  : {len(flagged)} ({len(planted) - len(missed)}/{len(planted)} planted found)")
+
+    if missed or peak > ceiling:
+        print("FAIL")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
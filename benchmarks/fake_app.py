@@ -0,0 +1,27 @@
+"""
+The API with the grading backends swapped for the benchmark fakes, for load
+tests against a local Postgres and Redis:
+
+    SG_FAKE_OCR_LATENCY_MS=300 uvicorn benchmarks.fake_app:app --port 8000
+
+The sentence encoder returns hash-seeded vectors, Vision returns the page
+texts of the synthetic fixture (benchmarks/pdfs.py, seed SG_FAKE_FIXTURE_SEED)
+after SG_FAKE_OCR_LATENCY_MS, grammar uses the heuristic checker and RAKE a
+frequency keyword picker. Everything else, auth, database and Redis
+included, is the real application.
+"""
+import os
+from app.utils.grading.config import cfg
+from benchmarks.fakes import install_fake_encoder, install_fake_ocr, use_heuristic_grammar, use_simple_keywords
+from benchmarks.pdfs import make_fixture
+
+
+install_fake_encoder()
+use_heuristic_grammar()
+use_simple_keywords()
+install_fake_ocr(float(os.getenv("SG_FAKE_OCR_LATENCY_MS", "300"))).load(
+    make_fixture(seed=int(os.getenv("SG_FAKE_FIXTURE_SEED", "0"))).page_texts
+)
+cfg["warmup"] = {**cfg.get("warmup", {}), "grammar": False, "vision": False}
+
+from main import app  # imported after the fakes so nothing captures the real backends first
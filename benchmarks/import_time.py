@@ -0,0 +1,93 @@
+"""
+Fail if importing the API regresses its cold start.
+
+    python -m benchmarks.import_time --budget-ms 1500
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter a few
+times, reports the slowest top-level imports of the best run, and exits
+non-zero when the cumulative import time exceeds the budget or when a
+grading dependency that must be loaded lazily shows up at import time.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+# Heavy grading dependencies that must only load on the first evaluation.
+LAZY_MODULES = (
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "google.cloud.vision",
+    "nltk",
+    "rake_nltk",
+    "vaderSentiment",
+    "pdfplumber",
+    "pdf2image",
+)
+
+
+def _import_times(module: str) -> Tuple[int, List[Tuple[int, str]]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    total_us = 0
+    top_level = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level imports are not indented; nested ones are.
+        if not name.startswith("  "):
+            us = int(cumulative)
+            total_us += us
+            top_level.append((us, name.strip()))
+    return total_us, sorted(top_level, reverse=True)
+
+
+def _eagerly_loaded(module: str) -> List[str]:
+    code = (
+        f"import json, sys, {module}; "
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs: List[Tuple[int, List[Tuple[int, str]]]] = [_import_times(args.module) for _ in range(args.runs)]
+    best_us, top_level = min(runs, key=lambda run: run[0])
+    best_ms = best_us / 1000
+
+    print(f"import {args.module}: {best_ms:.0f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    for us, name in top_level[:args.top]:
+        print(f"  {us / 1000:>8.1f} ms  {name}")
+
+    failures: Dict[str, str] = {}
+    eager = _eagerly_loaded(args.module)
+    if eager:
+        failures["eager imports"] = ", ".join(eager)
+    if best_ms > args.budget_ms:
+        failures["budget"] = f"{best_ms:.0f} ms > {args.budget_ms:.0f} ms"
+
+    for reason, detail in failures.items():
+        print(f"FAIL ({reason}): {detail}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Mixed-traffic HTTP load test for a locally running API.
+
+    SG_RATE_LIMIT=0 SG_FAKE_OCR_LATENCY_MS=300 uvicorn benchmarks.fake_app:app --port 8000 &
+    python -m benchmarks.load_test --email bench@example.com --password secret \
+        --users login=2,user=8,refresh=2,evaluate=2 --duration 60 --out benchmarks/results
+    python -m benchmarks.load_test ... --compare benchmarks/results/load-20250101T120000.json
+
+Each route gets a fixed number of closed-loop virtual users that send a
+request, wait for the response (and `--think-ms`), and repeat until
+`--duration` is up. The account must exist and be verified. /evaluate
+uploads synthetic PDFs from benchmarks/pdfs.py. The fixture seed matches
+the fake OCR in benchmarks/fake_app.py.
+
+Start the server with SG_RATE_LIMIT=0. Every virtual user comes from one IP
+and one account, so with the rate limiter on the login route is capped at
+10 requests a minute and /evaluate at a few, and the run mostly measures 429s.
+
+The report gives p50/p95/p99, errors and throughput per route. For the
+auth routes it also splits latency by whether an evaluation was in flight
+when the request started, which shows event-loop blocking. Results are saved
+as JSON, and --compare prints p95 changes against an earlier run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import httpx
+from benchmarks.pdfs import make_fixture, write_text_pdf
+
+
+AUTH_ROUTES = ("login", "user", "refresh")
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: List[Dict] = []
+        self.evaluations_in_flight = 0
+
+    def add(self, route: str, started: float, latency: float, status: int, during_evaluation: bool):
+        self.samples.append({"route": route, "t": started, "latency": latency, "status": status,
+                             "during_evaluation": during_evaluation})
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    values = sorted(latencies)
+
+    def pick(q: float) -> float:
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] * 1000
+
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": values[-1] * 1000,
+            "mean_ms": statistics.mean(values) * 1000}
+
+
+async def _login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/api/v1/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()["data"]["access_token"]
+
+
+def _request_factory(route: str, args, token: str, pdfs: Dict[str, bytes]):
+    auth = {"Authorization": f"Bearer {token}"}
+    if route == "login":
+        return lambda c: c.post("/api/v1/login", json={"email": args.email, "password": args.password})
+    if route == "user":
+        return lambda c: c.get("/api/v1/user", headers=auth)
+    if route == "refresh":
+        return lambda c: c.post("/api/v1/refresh-token", headers=auth)
+    if route == "evaluate":
+        return lambda c: c.post(
+            "/api/v1/evaluate",
+            headers=auth,
+            files={
+                "schema_pdf": ("schema.pdf", pdfs["schema"], "application/pdf"),
+                "answer_sheet_pdf": ("sheet.pdf", pdfs["sheet"], "application/pdf"),
+            },
+        )
+    raise ValueError(f"Unknown route {route!r}; choose from {AUTH_ROUTES + ('evaluate',)}")
+
+
+async def _virtual_user(route: str, send, client: httpx.AsyncClient, recorder: Recorder, deadline: float, think: float):
+    while time.perf_counter() < deadline:
+        during_evaluation = recorder.evaluations_in_flight > 0
+        if route == "evaluate":
+            recorder.evaluations_in_flight += 1
+        started = time.perf_counter()
+        try:
+            response = await send(client)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        finally:
+            if route == "evaluate":
+                recorder.evaluations_in_flight -= 1
+        recorder.add(route, started, time.perf_counter() - started, status, during_evaluation)
+        if think:
+            await asyncio.sleep(think)
+
+
+def _fixture_pdfs(seed: int) -> Dict[str, bytes]:
+    fixture = make_fixture(seed=seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = {"schema": os.path.join(workdir, "schema.pdf"), "sheet": os.path.join(workdir, "sheet.pdf")}
+        write_text_pdf(paths["schema"], [fixture.schema_text])
+        write_text_pdf(paths["sheet"], fixture.page_texts)
+        return {name: open(path, "rb").read() for name, path in paths.items()}
+
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, Dict]:
+    routes = sorted({s["route"] for s in recorder.samples})
+    report = {}
+    for route in routes:
+        samples = [s for s in recorder.samples if s["route"] == route]
+        ok = [s["latency"] for s in samples if 200 <= s["status"] < 400]
+        entry = {
+            "requests": len(samples),
+            "errors": len(samples) - len(ok),
+            "throughput_rps": len(samples) / duration,
+            **_percentiles(ok),
+        }
+        if route in AUTH_ROUTES:
+            entry["during_evaluation"] = _percentiles([s["latency"] for s in samples if s["during_evaluation"]])
+            entry["idle"] = _percentiles([s["latency"] for s in samples if not s["during_evaluation"]])
+        report[route] = entry
+    return report
+
+
+def _print_report(report: Dict[str, Dict]):
+    print(f"{'route':10s} {'reqs':>6s} {'err':>5s} {'rps':>7s} {'p50':>9s} {'p95':>9s} {'p99':>9s}")
+    for route, r in report.items():
+        print(f"{route:10s} {r['requests']:6d} {r['errors']:5d} {r['throughput_rps']:7.1f} "
+              f"{r.get('p50_ms', 0):8.1f}ms {r.get('p95_ms', 0):8.1f}ms {r.get('p99_ms', 0):8.1f}ms")
+    for route, r in report.items():
+        busy, idle = r.get("during_evaluation"), r.get("idle")
+        if busy and idle:
+            print(f"  {route}: p95 {idle['p95_ms']:.1f}ms idle vs {busy['p95_ms']:.1f}ms while evaluations run")
+
+
+def _compare(report: Dict[str, Dict], previous_path: str):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)["routes"]
+    print(f"\np95 vs {previous_path}:")
+    for route, r in report.items():
+        before = previous.get(route, {}).get("p95_ms")
+        if before and "p95_ms" in r:
+            print(f"  {route:10s} {before:8.1f}ms -> {r['p95_ms']:8.1f}ms ({r['p95_ms'] / before - 1:+.1%})")
+
+
+async def run(args) -> Dict:
+    users = {route: int(n) for route, n in (item.split("=") for item in args.users.split(",") if item)}
+    pdfs = _fixture_pdfs(args.seed) if users.get("evaluate") else {}
+    limits = httpx.Limits(max_connections=sum(users.values()) + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        token = await _login(client, args.email, args.password)
+        recorder = Recorder()
+        deadline = time.perf_counter() + args.duration
+        tasks = [
+            _virtual_user(route, _request_factory(route, args, token, pdfs), client, recorder, deadline, args.think_ms / 1000)
+            for route, count in users.items() for _ in range(count)
+        ]
+        start = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "base_url": args.base_url,
+        "users": users,
+        "duration_s": elapsed,
+        "routes": summarize(recorder, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--users", default="login=2,user=8,refresh=2,evaluate=2", help="virtual users per route")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--think-ms", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmarks/results", help="directory for the JSON results")
+    parser.add_argument("--compare", metavar="PATH", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    try:
+        result = asyncio.run(run(args))
+    except httpx.HTTPError as e:
+        print(f"Could not log in at {args.base_url}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    _print_report(result["routes"])
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"load-{time.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        _compare(result["routes"], args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Caller-side cost of logging, which is what the event loop and grading
+threads pay per call.
+
+    python -m benchmarks.logging_overhead --calls 50000
+
+Compares:
+  - a synchronous rotating file handler (formats and writes on the caller)
+  - the queue handler from app/utils/log_handler.py (text and JSON output)
+  - a disabled DEBUG call with an eager f-string vs lazy %-style arguments
+  - `log_sampled` at the configured rate on an enabled level
+"""
+import argparse
+import logging
+import os
+import queue
+import tempfile
+import time
+from logging.handlers import QueueListener, TimedRotatingFileHandler
+from typing import Callable, List
+from app.utils.grading.logger import log_sampled
+from app.utils.log_handler import JsonFormatter, _RecordQueueHandler
+
+
+FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+
+
+def _measure(fn: Callable[[int], None], calls: int) -> List[float]:
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples
+
+
+def _report(name: str, samples: List[float]):
+    mean = sum(samples) / len(samples)
+    p99 = samples[int(0.99 * (len(samples) - 1))]
+    print(f"{name:34s} mean {mean * 1e6:8.2f} us   p99 {p99 * 1e6:8.2f} us   max {samples[-1] * 1e6:9.1f} us")
+
+
+def _logger(name: str, handler: logging.Handler, level: int = logging.INFO) -> logging.Logger:
+    logger = logging.Logger(name, level)
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50000)
+    args = parser.parse_args()
+
+    payload = {"question_id": 7, "scores": [0.61, 0.83, 0.42], "feedback": "Good"}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        sync_handler = TimedRotatingFileHandler(os.path.join(workdir, "sync.log"), when="midnight", encoding="utf-8")
+        sync_handler.setFormatter(logging.Formatter(FORMAT))
+        sync = _logger("bench.sync", sync_handler)
+        _report("sync file handler", _measure(lambda i: sync.info("Scored answer %d: %s", i, payload), args.calls))
+        sync_handler.close()
+
+        for label, formatter in (("queue handler (text)", logging.Formatter(FORMAT)), ("queue handler (json)", JsonFormatter())):
+            file_handler = TimedRotatingFileHandler(os.path.join(workdir, "queued.log"), when="midnight", encoding="utf-8")
+            file_handler.setFormatter(formatter)
+            queue_handler = _RecordQueueHandler(queue.SimpleQueue())
+            listener = QueueListener(queue_handler.queue, file_handler)
+            listener.start()
+            queued = _logger(f"bench.{label}", queue_handler)
+            _report(label, _measure(lambda i: queued.info("Scored answer %d: %s", i, payload), args.calls))
+            drain = time.perf_counter()
+            listener.stop()
+            print(f"{'':34s} (writer drained the backlog in {time.perf_counter() - drain:.2f} s off the caller)")
+            file_handler.close()
+
+        disabled = _logger("bench.disabled", logging.NullHandler(), logging.INFO)
+        _report("disabled debug, f-string", _measure(lambda i: disabled.debug(f"Scored answer {i}: {payload}"), args.calls))
+        _report("disabled debug, lazy args", _measure(lambda i: disabled.debug("Scored answer %d: %s", i, payload), args.calls))
+
+        sampled_handler = TimedRotatingFileHandler(os.path.join(workdir, "sampled.log"), when="midnight", encoding="utf-8")
+        sampled_handler.setFormatter(logging.Formatter(FORMAT))
+        sampled = _logger("bench.sampled", sampled_handler, logging.DEBUG)
+        _report("log_sampled debug (sync handler)",
+                _measure(lambda i: log_sampled(sampled, logging.DEBUG, "Scored answer %d: %s", i, payload), args.calls))
+        sampled_handler.close()
+
+
+if __name__ == "__main__":
+    main()
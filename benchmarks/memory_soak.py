@@ -0,0 +1,109 @@
+"""
+Soak test for memory growth in the grading pipeline.
+
+    python -m benchmarks.memory_soak --rounds 30 --scripts 20 --max-growth-mb 8
+
+Grades `--scripts` synthetic answer scripts per round with the fake encoder
+and reports process RSS (and tracemalloc-traced memory with --tracemalloc)
+after every round. The first `--warmup-rounds` fill caches and allocator
+pools; after that memory must stay flat. Exits non-zero when steady-state
+RSS grows by more than `--max-growth-mb`, printing the allocation sites that
+grew most when tracemalloc is on. Pass --languagetool to exercise the real
+grammar checker subprocesses instead of the heuristic.
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from app.utils import memory
+from app.utils.grading import engine
+from benchmarks.fakes import install_fake_encoder, use_heuristic_grammar
+
+
+WORDS = [
+    "energy", "light", "glucose", "chlorophyll", "carbon", "dioxide", "oxygen", "water", "plant",
+    "cell", "membrane", "reaction", "enzyme", "stomata", "leaf", "root", "sugar", "process",
+    "the", "a", "of", "and", "is", "in", "to", "it", "this", "because", "which", "produces",
+]
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + "."
+
+
+def _text(rng: random.Random, sentences: int) -> str:
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def _schema(rng: random.Random, questions: int):
+    model_answers = {q: _text(rng, 4) for q in range(1, questions + 1)}
+    rubric = {"questions": [
+        {"question_id": q, "max_marks": 10, "penalties": {}, "bonus": {},
+         "expected_keywords": rng.sample(WORDS[:18], 6)}
+        for q in model_answers
+    ]}
+    return model_answers, rubric
+
+
+def _grade_round(rng: random.Random, model_answers, rubric, scripts: int):
+    for _ in range(scripts):
+        answers = {q: _text(rng, rng.randint(2, 8)) for q in model_answers}
+        engine.evaluate_script(answers, model_answers, rubric)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--warmup-rounds", type=int, default=5)
+    parser.add_argument("--scripts", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--max-growth-mb", type=float, default=8.0)
+    parser.add_argument("--tracemalloc", action="store_true", help="also track Python allocations (slower)")
+    parser.add_argument("--languagetool", action="store_true", help="use LanguageTool instead of the heuristic")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    install_fake_encoder()
+    if not args.languagetool:
+        use_heuristic_grammar()
+    if args.tracemalloc:
+        tracemalloc.start(10)
+
+    rng = random.Random(args.seed)
+    model_answers, rubric = _schema(rng, args.questions)
+    baseline = None
+    rss = []
+
+    start = time.perf_counter()
+    for round_number in range(1, args.rounds + 1):
+        _grade_round(rng, model_answers, rubric, args.scripts)
+        gc.collect()
+        usage = memory.sample()
+        rss.append(usage["rss"])
+        if round_number == args.warmup_rounds:
+            baseline = memory.take_snapshot()["id"]
+        print(f"round {round_number:3d}: rss {usage['rss'] / 2 ** 20:8.1f} MiB"
+              + (f"  traced {usage['traced'] / 2 ** 20:7.1f} MiB" if args.tracemalloc else "")
+              + ("  (warmup)" if round_number <= args.warmup_rounds else ""))
+    elapsed = time.perf_counter() - start
+
+    steady = rss[args.warmup_rounds - 1:] if args.warmup_rounds else rss
+    growth = (steady[-1] - steady[0]) / 2 ** 20
+    print(f"\n{args.rounds * args.scripts} scripts in {elapsed:.1f} s; "
+          f"steady-state RSS growth {growth:+.1f} MiB (limit {args.max_growth_mb} MiB)")
+
+    if growth > args.max_growth_mb:
+        if baseline is not None:
+            diff = memory.diff_snapshots(baseline, limit=10)
+            print("\nobject count changes:", diff["object_deltas"])
+            for stat in diff.get("top_growth", []):
+                print(f"  {stat['size_delta'] / 1024:+10.1f} KiB  {stat['location']}")
+        print("FAIL: memory grew in steady state")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Event-loop lag during a burst of concurrent logins.
+
+    python -m benchmarks.password_hashing --logins 50 --rounds 12 --workers 4
+
+A ticker coroutine asks to wake every `--tick-ms` and records how late it
+actually woke; that lateness is what every other request on the loop waits.
+The same burst of bcrypt verifications runs twice:
+
+  - inline: `pwd_context.verify` called on the event loop, as login used to
+  - offloaded: `verify_password` from app/utils/password_hasher.py, which
+    runs bcrypt on a bounded pool of `--workers` threads
+
+For each it prints loop lag (p50/p99/max) and how long the whole burst took.
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+async def _measure(burst: Callable[[], Awaitable[None]], tick: float) -> Dict[str, float]:
+    lags: List[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + tick
+            await asyncio.sleep(tick)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(tick * 2)
+    start = time.perf_counter()
+    await burst()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker_task
+    return {"burst_s": elapsed, "lag_p50_ms": _percentile(lags, 0.5) * 1000,
+            "lag_p99_ms": _percentile(lags, 0.99) * 1000, "lag_max_ms": max(lags, default=0.0) * 1000}
+
+
+async def run(args):
+    # Read by password_hasher at import time.
+    os.environ["SG_BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["SG_BCRYPT_WORKERS"] = str(args.workers)
+    from app.utils.password_hasher import pwd_context, verify_password
+
+    stored = pwd_context.hash("correct horse battery staple")
+    tick = args.tick_ms / 1000
+
+    async def inline_login():
+        pwd_context.verify("correct horse battery staple", stored)
+        await asyncio.sleep(0)
+
+    async def offloaded_login():
+        await verify_password("correct horse battery staple", stored)
+
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.rounds}, {args.workers} hashing workers")
+    print(f"{'mode':10s} {'burst':>9s} {'lag p50':>10s} {'lag p99':>10s} {'lag max':>10s}")
+    for label, login in (("inline", inline_login), ("offloaded", offloaded_login)):
+        result = await _measure(lambda: asyncio.gather(*(login() for _ in range(args.logins))), tick)
+        print(f"{label:10s} {result['burst_s']:8.2f}s {result['lag_p50_ms']:8.1f}ms "
+              f"{result['lag_p99_ms']:8.1f}ms {result['lag_max_ms']:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Synthetic schema and answer-sheet PDFs for the benchmarks.
+
+Typed PDFs are written by hand (Helvetica text, no dependencies), so
+pdfplumber can extract their text. Image-only PDFs are rendered with Pillow
+and carry no text layer, like a scanned answer sheet; the page texts are
+returned alongside so a fake OCR engine can "recognise" them.
+
+    python -m benchmarks.pdfs --out /tmp/fixtures --questions 10 --pages 4
+"""
+import argparse
+import os
+import random
+import textwrap
+from dataclasses import dataclass
+from typing import Dict, List
+
+
+WORDS = [
+    "energy", "light", "glucose", "chlorophyll", "carbon", "dioxide", "oxygen", "water", "plant",
+    "cell", "membrane", "reaction", "enzyme", "stomata", "leaf", "root", "sugar", "process",
+    "absorb", "release", "convert", "chemical", "stored", "produce", "sunlight", "photon",
+    "the", "a", "of", "and", "is", "in", "to", "it", "this", "because", "which", "through",
+]
+
+LINE_CHARS = 90
+LINES_PER_PAGE = 50
+
+
+@dataclass
+class Fixture:
+    schema_text: str
+    model_answers: Dict[int, str]
+    student_answers: Dict[int, str]
+    page_texts: List[str]
+    max_marks: List[int]
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    sentences, count = [], 0
+    while count < words:
+        sentence = _sentence(rng)
+        sentences.append(sentence)
+        count += len(sentence.split())
+    return " ".join(sentences)
+
+
+def make_fixture(questions: int = 10, pages: int = 4, answer_words: int = 120, seed: int = 0) -> Fixture:
+    """
+    Generate a schema and one student's answers. The answers are spread over
+    `pages` pages, so questions may continue across page boundaries.
+    """
+    rng = random.Random(seed)
+    model_answers = {q: _paragraph(rng, max(10, answer_words // 2)) for q in range(1, questions + 1)}
+    student_answers = {q: _paragraph(rng, answer_words) for q in range(1, questions + 1)}
+    schema_text = "\n".join(f"Q{q}: Explain topic {q}.\nAnswer: {a}" for q, a in model_answers.items())
+
+    lines = []
+    for q, answer in student_answers.items():
+        lines.append(f"Q{q}:")
+        lines.extend(textwrap.wrap(answer, LINE_CHARS))
+    per_page = max(1, -(-len(lines) // max(1, pages)))
+    page_texts = ["\n".join(lines[i:i + per_page]) for i in range(0, len(lines), per_page)]
+    # Drawn last so the texts for a given seed are unchanged.
+    max_marks = [rng.choice((5, 8, 10)) for _ in model_answers]
+    return Fixture(schema_text, model_answers, student_answers, page_texts, max_marks)
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _paginate(text: str) -> List[List[str]]:
+    lines = [wrapped for line in text.splitlines() for wrapped in (textwrap.wrap(line, LINE_CHARS) or [""])]
+    return [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+
+def write_text_pdf(path: str, pages: List[str]):
+    """Write a minimal typed PDF, one string per page (long pages overflow onto new ones)."""
+    page_lines = [chunk for text in pages for chunk in _paginate(text)]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in page_lines:
+        body = "BT /F1 11 Tf 14 TL 56 790 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = body.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_image_pdf(path: str, pages: List[str], dpi: int = 100):
+    """Write an image-only PDF (no text layer): each page is rendered to a bitmap."""
+    from PIL import Image, ImageDraw
+
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    images = []
+    for text in pages:
+        image = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(image)
+        y = dpi // 2
+        for line in text.splitlines():
+            draw.text((dpi // 2, y), line, fill=0)
+            y += 14
+        images.append(image)
+    images[0].save(path, "PDF", resolution=dpi, save_all=True, append_images=images[1:])
+    for image in images:
+        image.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--answer-words", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    fixture = make_fixture(args.questions, args.pages, args.answer_words, args.seed)
+    write_text_pdf(os.path.join(args.out, "schema.pdf"), [fixture.schema_text])
+    write_text_pdf(os.path.join(args.out, "answers_typed.pdf"), fixture.page_texts)
+    write_image_pdf(os.path.join(args.out, "answers_scanned.pdf"), fixture.page_texts)
+    print(f"Wrote schema.pdf, answers_typed.pdf and answers_scanned.pdf to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
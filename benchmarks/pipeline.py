@@ -0,0 +1,178 @@
+"""
+Offline benchmark of each grading stage and of `run_evaluation` end to end.
+
+    python -m benchmarks.pipeline --questions 10 --pages 4 --repeat 20 --save benchmarks/baselines/pipeline.json
+    python -m benchmarks.pipeline --baseline benchmarks/baselines/pipeline.json --threshold 0.2
+
+Synthetic schema and answer-sheet PDFs are generated per run (see
+benchmarks/pdfs.py). The sentence encoder and Google Vision are replaced by
+the fakes in benchmarks/fakes.py, and grammar uses the heuristic checker
+unless --languagetool is given, so timings reflect this code rather than the
+network or model downloads. Stages that rasterize PDFs need poppler and are
+skipped without it.
+
+With --baseline, each stage's median is compared to the stored one; the run
+fails when a stage is more than `--threshold` (relative) and `--min-delta-ms`
+(absolute) slower. The committed baseline in benchmarks/baselines/ was taken
+with the default parameters on a machine without poppler, so it has no
+process_pdf or run_evaluation entries; re-save it on the machine you compare
+on before relying on absolute numbers.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+from benchmarks.fakes import install_fake_encoder, install_fake_ocr, use_heuristic_grammar, use_simple_keywords
+from benchmarks.pdfs import make_fixture, write_image_pdf, write_text_pdf
+
+
+def _time(fn: Callable, repeat: int) -> Dict[str, float]:
+    fn()  # warm caches and lazy imports outside the measurement
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "min_ms": samples[0],
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+    }
+
+
+def run_stages(args, workdir: str) -> Dict[str, Dict[str, float]]:
+    from app.utils.grading import engine
+    from app.utils.grading.evaluation import extract_pdf_text, run_evaluation
+    from app.utils.grading.ocr import process_pdf
+    from app.utils.grading.quality import quality_score
+    from app.utils.grading.rubric import apply_rubric_to_answer
+    from app.utils.grading.semantic import batch_similarity, similarity_score
+
+    fixture = make_fixture(args.questions, args.pages, args.answer_words, args.seed)
+    schema_pdf = os.path.join(workdir, "schema.pdf")
+    scanned_pdf = os.path.join(workdir, "answers_scanned.pdf")
+    write_text_pdf(schema_pdf, [fixture.schema_text])
+    write_image_pdf(scanned_pdf, fixture.page_texts)
+    fake_ocr = install_fake_ocr(args.ocr_latency_ms)
+    fake_ocr.load(fixture.page_texts)
+
+    schema_text = extract_pdf_text(schema_pdf)
+    # As the /evaluate route does, so rubric scoring runs against real marks.
+    max_marks = fixture.max_marks
+    model_answers, rubric = engine.parse_schema(schema_text, max_marks)
+    sheet_text = "".join(f"\n--- Page {i + 1} ---\n{t}\n" for i, t in enumerate(fixture.page_texts))
+    student_answers = engine.parse_student_answers(sheet_text)
+    qids = sorted(model_answers)
+    questions = {q["question_id"]: q for q in rubric["questions"]}
+    first = qids[0]
+
+    results = {}
+    stages = [
+        ("extract_pdf_text", lambda: extract_pdf_text(schema_pdf)),
+        ("parse_schema", lambda: engine.parse_schema(schema_text, max_marks)),
+        ("parse_student_answers", lambda: engine.parse_student_answers(sheet_text)),
+        ("similarity_score", lambda: similarity_score(model_answers[first], student_answers.get(first, ""))),
+        ("batch_similarity", lambda: batch_similarity([model_answers[q] for q in qids], [student_answers.get(q, "") for q in qids])),
+        ("quality_score", lambda: [quality_score(student_answers.get(q, "")) for q in qids]),
+        ("apply_rubric_to_answer", lambda: [apply_rubric_to_answer(student_answers.get(q, ""), questions[q]) for q in qids]),
+    ]
+    if shutil.which("pdftoppm"):
+        stages += [
+            ("process_pdf", lambda: process_pdf(scanned_pdf)),
+            ("run_evaluation", lambda: run_evaluation(schema_pdf, scanned_pdf, max_marks)),
+        ]
+    else:
+        print("poppler not found: skipping process_pdf and run_evaluation", file=sys.stderr)
+
+    for name, fn in stages:
+        repeat = max(1, args.repeat // 5) if name in ("process_pdf", "run_evaluation") else args.repeat
+        results[name] = _time(fn, repeat)
+        print(f"{name:24s} median {results[name]['median_ms']:9.2f} ms   p95 {results[name]['p95_ms']:9.2f} ms")
+    return results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, min_delta_ms: float) -> int:
+    regressions = 0
+    print(f"\n{'stage':24s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name, base in baseline["stages"].items():
+        current = results.get(name)
+        if current is None:
+            print(f"{name:24s} {base['median_ms']:10.2f} {'skipped':>10s}")
+            continue
+        delta = current["median_ms"] - base["median_ms"]
+        ratio = current["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        regressed = ratio > 1 + threshold and delta > min_delta_ms
+        regressions += regressed
+        print(f"{name:24s} {base['median_ms']:10.2f} {current['median_ms']:10.2f} {ratio - 1:+8.1%}"
+              + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--answer-words", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--ocr-latency-ms", type=float, default=0.0, help="simulated Vision latency per page")
+    parser.add_argument("--languagetool", action="store_true", help="use LanguageTool instead of the heuristic")
+    parser.add_argument("--real-encoder", action="store_true", help="load the configured sentence-transformers model")
+    parser.add_argument("--real-keywords", action="store_true", help="use RAKE (needs the NLTK corpora)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="PATH", help="write results as a new baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown per stage")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    if not args.real_encoder:
+        install_fake_encoder()
+    if not args.languagetool:
+        use_heuristic_grammar()
+    if not args.real_keywords:
+        use_simple_keywords()
+
+    workdir = tempfile.mkdtemp(prefix="sg-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # run_evaluation writes result.json to the working directory
+    try:
+        results = run_stages(args, workdir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": {k: getattr(args, k) for k in ("questions", "pages", "answer_words", "repeat", "ocr_latency_ms",
+                                                 "languagetool", "real_encoder", "real_keywords", "seed")},
+        "stages": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != report["params"]:
+            print(f"warning: baseline parameters differ: {baseline.get('params')}", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"FAIL: {regressions} stage(s) regressed")
+            sys.exit(1)
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Per-request cost of the rate limiter against the Redis in SG_REDIS_HOST/PORT.
+
+    python -m benchmarks.rate_limiter --requests 5000 --concurrency 16
+
+Sends the same request through a trivial ASGI app with and without
+RateLimitMiddleware (in process, no sockets) and prints the latency
+difference. The target is under a millisecond. It also reports the script
+call on its own and checks that a small bucket starts refusing once it is
+drained.
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from app.redis.redis_client import redis_handler
+from app.utils import rate_limiter
+from app.utils.rate_limiter import RateLimitMiddleware, RatePolicy
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+async def _drive(app, requests: int, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                await client.get("/api/v1/ping")
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def _report(name: str, latencies: List[float]):
+    print(f"{name:22s} p50 {_percentile(latencies, 0.5) * 1000:7.3f} ms   p99 {_percentile(latencies, 0.99) * 1000:7.3f} ms")
+
+
+async def run(args):
+    if not await redis_handler.connect():
+        raise SystemExit("Could not connect to Redis (SG_REDIS_HOST/SG_REDIS_PORT)")
+
+    # Generous enough that the overhead run is never refused.
+    rate_limiter.DEFAULT_POLICY = RatePolicy("bench", capacity=args.requests * 2, refill_per_second=args.requests)
+    inner = Starlette(routes=[Route("/api/v1/ping", lambda request: PlainTextResponse("pong"))])
+    limited = RateLimitMiddleware(inner)
+
+    await _drive(limited, 200, args.concurrency)  # load the script, warm connections
+    bare = await _drive(inner, args.requests, args.concurrency)
+    with_limit = await _drive(limited, args.requests, args.concurrency)
+    _report("without limiter", bare)
+    _report("with limiter", with_limit)
+    print(f"{'overhead':22s} p50 {(_percentile(with_limit, 0.5) - _percentile(bare, 0.5)) * 1000:7.3f} ms   "
+          f"p99 {(_percentile(with_limit, 0.99) - _percentile(bare, 0.99)) * 1000:7.3f} ms")
+
+    script_calls = []
+    for i in range(args.requests):
+        start = time.perf_counter()
+        await rate_limiter.take(rate_limiter.DEFAULT_POLICY, f"bench:{i % 100}")
+        script_calls.append(time.perf_counter() - start)
+    _report("take() alone", script_calls)
+
+    small = RatePolicy("bench_small", capacity=5, refill_per_second=0.1)
+    identity = f"bench:{time.time()}"
+    decisions = [await rate_limiter.take(small, identity) for _ in range(7)]
+    print("small bucket          " + " ".join("ok" if d.allowed else f"429({d.retry_after:.1f}s)" for d in decisions))
+
+    await redis_handler.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+End-to-end throughput of the grading pipeline against recorded Vision and
+LanguageTool responses.
+
+Record once, with credentials and a LanguageTool install:
+
+    python -m benchmarks.replay_throughput --mode record --schema schema.pdf --sheets a.pdf b.pdf
+
+then replay anywhere (CI included) without either service:
+
+    python -m benchmarks.replay_throughput --mode replay --schema schema.pdf --sheets a.pdf b.pdf \
+        --scripts 40 --concurrency 4 --latency recorded
+
+Each script is graded with `iter_evaluation`, cycling through the given
+sheets. Replayed calls sleep for their recorded latency (or a lognormal
+draw, or not at all), so throughput reflects realistic service waits while
+staying reproducible. Rasterizing needs poppler. Without --schema,
+synthetic typed PDFs are generated (see benchmarks/pdfs.py).
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from app.utils.grading.config import cfg
+from app.utils.metrics import start_timings
+from benchmarks.fakes import install_fake_encoder, use_simple_keywords
+from benchmarks.pdfs import make_fixture, write_text_pdf
+
+
+def _grade(schema_pdf: str, sheet_pdf: str) -> float:
+    from app.utils.grading.evaluation import iter_evaluation
+    start = time.perf_counter()
+    for record in iter_evaluation(schema_pdf, sheet_pdf):
+        pass
+    return time.perf_counter() - start
+
+
+def _percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("record", "replay"), default="replay")
+    parser.add_argument("--dir", default=cfg.get("replay", {}).get("dir", "data/replay"))
+    parser.add_argument("--latency", choices=("recorded", "lognormal", "none"), default="recorded")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--schema")
+    parser.add_argument("--sheets", nargs="*", default=[])
+    parser.add_argument("--synthetic-sheets", type=int, default=3, help="sheets to generate when --schema is omitted")
+    parser.add_argument("--scripts", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--fake-encoder", action="store_true")
+    parser.add_argument("--fake-keywords", action="store_true", help="skip RAKE (needs the NLTK corpora)")
+    args = parser.parse_args()
+
+    cfg["replay"] = {
+        **cfg.get("replay", {}),
+        "mode": args.mode,
+        "dir": args.dir,
+        "latency": args.latency,
+        "latency_scale": args.latency_scale,
+    }
+    if args.fake_encoder:
+        install_fake_encoder()
+    if args.fake_keywords:
+        use_simple_keywords()
+
+    schema_pdf, sheets = args.schema, list(args.sheets)
+    if not schema_pdf:
+        workdir = tempfile.mkdtemp(prefix="sg-replay-")
+        schema_pdf = os.path.join(workdir, "schema.pdf")
+        for i in range(args.synthetic_sheets):
+            fixture = make_fixture(seed=i)
+            if i == 0:
+                write_text_pdf(schema_pdf, [fixture.schema_text])
+            sheets.append(os.path.join(workdir, f"sheet_{i}.pdf"))
+            write_text_pdf(sheets[-1], fixture.page_texts)
+    if not sheets:
+        parser.error("--sheets is required with --schema")
+
+    scripts = args.scripts if args.mode == "replay" else len(sheets)
+    timings = start_timings()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [
+            executor.submit(copy_context().run, _grade, schema_pdf, sheets[i % len(sheets)])
+            for i in range(scripts)
+        ]
+        latencies = sorted(f.result() for f in futures)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.mode}: {scripts} scripts ({len(sheets)} distinct), concurrency {args.concurrency}, latency {args.latency}")
+    print(f"throughput : {scripts / elapsed:.2f} scripts/s ({elapsed:.1f} s)")
+    print(f"latency    : p50 {_percentile(latencies, 0.5):.2f} s  p95 {_percentile(latencies, 0.95):.2f} s  "
+          f"mean {statistics.mean(latencies):.2f} s")
+    print("stage busy time (s):")
+    for stage, seconds in sorted(timings.items(), key=lambda kv: -kv[1]):
+        print(f"  {stage:18s} {seconds:8.2f}")
+    if args.mode == "record":
+        print(f"\nRecordings written to {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cohort-scale benchmark for rubric keyword matching.
+
+    python -m benchmarks.rubric_matcher --students 500 --questions 20
+
+Compares the previous per-keyword substring scan with both matchers
+`apply_rubric_to_answer` can use, on synthetic answers and keyword lists:
+the token-bounded scan (ScanMatcher) and the Aho-Corasick automaton
+(KeywordMatcher). The old scan is not token-bounded, so it also over-counts
+(e.g. "cell" inside "cells"). The automaton's cost depends on answer length
+only, not on the number of rubric terms; `get_matcher` switches to it at
+AUTOMATON_MIN_TERMS terms. Run with a few --keywords values to check that
+threshold.
+"""
+import argparse
+import random
+import time
+from app.utils.grading.matcher import AUTOMATON_MIN_TERMS, KeywordMatcher, ScanMatcher, clear_cache, get_matcher
+from app.utils.grading.rubric import apply_rubric_to_answer
+
+
+VOCABULARY = [
+    "energy", "light", "glucose", "chlorophyll", "carbon", "dioxide", "oxygen", "water", "plant",
+    "cell", "membrane", "reaction", "enzyme", "stomata", "leaf", "root", "sugar", "process",
+    "absorb", "release", "convert", "chemical", "stored", "produce", "sunlight", "photon",
+]
+
+
+FILLER = [f"w{i}" for i in range(2000)] + ["the", "a", "of", "and", "is", "in", "to", "it"]
+
+
+def _phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def _answer(rng: random.Random, words: int, keyword_share: float = 0.2) -> str:
+    return " ".join(
+        rng.choice(VOCABULARY) if rng.random() < keyword_share else rng.choice(FILLER)
+        for _ in range(words)
+    )
+
+
+def _substring_scan(student_answer: str, q: dict) -> int:
+    ans = student_answer.lower()
+    found = sum(1 for kw in q["expected_keywords"] if kw.lower() in ans)
+    found += sum(1 for k in q["bonus"] if k in ans)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--keywords", type=int, default=15)
+    parser.add_argument("--answer-words", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    questions = [
+        {
+            "question_id": qid,
+            "max_marks": 10,
+            "expected_keywords": [_phrase(rng, rng.randint(1, 3)) for _ in range(args.keywords)],
+            "penalties": {_phrase(rng, 2): 0.5},
+            "bonus": {_phrase(rng, 2): 1.0, _phrase(rng, 1): 0.5},
+        }
+        for qid in range(1, args.questions + 1)
+    ]
+    answers = [[_answer(rng, args.answer_words) for _ in questions] for _ in range(args.students)]
+    cells = args.students * args.questions
+
+    start = time.perf_counter()
+    for student in answers:
+        for q, answer in zip(questions, student):
+            _substring_scan(answer, q)
+    substring_s = time.perf_counter() - start
+
+    timings = {}
+    for name, cls in (("token scan", ScanMatcher), ("automaton", KeywordMatcher)):
+        matchers = [cls({"keywords": q["expected_keywords"], "bonus": list(q["bonus"])}) for q in questions]
+        start = time.perf_counter()
+        for student in answers:
+            for matcher, answer in zip(matchers, student):
+                matcher.find(answer)
+        timings[name] = time.perf_counter() - start
+
+    clear_cache()
+    chosen = type(get_matcher(questions[0])).__name__
+    start = time.perf_counter()
+    for student in answers:
+        for q, answer in zip(questions, student):
+            apply_rubric_to_answer(answer, q)
+    rubric_s = time.perf_counter() - start
+
+    print(f"{args.students} students x {args.questions} questions, {args.keywords} keywords, {args.answer_words}-word answers")
+    print(f"substring scan : {substring_s:8.3f} s  ({substring_s / cells * 1e6:8.1f} us/answer)")
+    for name, seconds in timings.items():
+        print(f"{name:15s}: {seconds:8.3f} s  ({seconds / cells * 1e6:8.1f} us/answer)")
+    print(f"full rubric    : {rubric_s:8.3f} s  ({rubric_s / cells * 1e6:8.1f} us/answer, {chosen}, threshold {AUTOMATON_MIN_TERMS} terms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Measure resident memory per gunicorn worker for each model loading mode.
+
+    python -m benchmarks.worker_rss --workers 3 --modes master,worker
+
+By default workers serve a stub ASGI app so the numbers isolate the encoder
+footprint and the benchmark runs without Postgres/Redis. Pass --app main:app
+to measure the full API. PSS splits shared pages between the processes that
+map them, so the sum of PSS is the real memory used by the whole group.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+
+async def probe_app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _children(pid: int) -> List[int]:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    usage = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                usage[parts[0].rstrip(":")] = int(parts[1])
+    usage["Private"] = usage.pop("Private_Clean", 0) + usage.pop("Private_Dirty", 0)
+    return usage
+
+
+def measure(mode: str, workers: int, app: str, settle: float, timeout: float) -> Dict[str, Dict[str, int]]:
+    env = dict(os.environ, SG_MODEL_LOAD=mode, SG_WEB_WORKERS=str(workers), SG_BIND="127.0.0.1:0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", app],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + timeout
+        while len(_children(proc.pid)) < workers:
+            if proc.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+            if time.time() > deadline:
+                raise TimeoutError(f"workers did not start within {timeout}s")
+            time.sleep(0.5)
+        time.sleep(settle)
+        usage = {"master": _memory_kb(proc.pid)}
+        for i, pid in enumerate(sorted(_children(proc.pid))):
+            usage[f"worker-{i}"] = _memory_kb(pid)
+        return usage
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--modes", default="master,worker")
+    parser.add_argument("--app", default="benchmarks.worker_rss:probe_app")
+    parser.add_argument("--settle", type=float, default=10.0, help="seconds to wait after workers start")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        usage = measure(mode, args.workers, args.app, args.settle, args.timeout)
+        print(f"\nSG_MODEL_LOAD={mode} ({args.workers} workers)")
+        print(f"{'process':<10} {'RSS MiB':>10} {'PSS MiB':>10} {'Private MiB':>12}")
+        for name, kb in usage.items():
+            print(f"{name:<10} {kb['Rss'] / 1024:>10.1f} {kb['Pss'] / 1024:>10.1f} {kb['Private'] / 1024:>12.1f}")
+        total_pss = sum(kb["Pss"] for kb in usage.values()) / 1024
+        print(f"{'total PSS':<10} {total_pss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,17 @@ class Environment:
     REDIS_PORT:str=os.getenv("SG_REDIS_PORT")
     REDIS_PASSWORD:str=os.getenv("SG_REDIS_PASSWORD")
     LOG_DIR:str=os.getenv("SG_LOG_DIR")
+    LOG_JSON:str=os.getenv("SG_LOG_JSON", "0")
+    WEB_WORKERS:str=os.getenv("SG_WEB_WORKERS", "2")
+    MODEL_LOAD:str=os.getenv("SG_MODEL_LOAD", "master")
+    TORCH_THREADS:str=os.getenv("SG_TORCH_THREADS")
+    TRACE_EXPORTER:str=os.getenv("SG_TRACE_EXPORTER", "none")
+    TRACE_FILE:str=os.getenv("SG_TRACE_FILE")
+    MEMORY_TRACKING:str=os.getenv("SG_MEMORY_TRACKING", "0")
+    TRACEMALLOC_FRAMES:str=os.getenv("SG_TRACEMALLOC_FRAMES", "1")
+    BCRYPT_ROUNDS:str=os.getenv("SG_BCRYPT_ROUNDS", "12")
+    BCRYPT_WORKERS:str=os.getenv("SG_BCRYPT_WORKERS", "4")
+    RATE_LIMIT:str=os.getenv("SG_RATE_LIMIT", "1")
 
     @classmethod
     def to_dict(cls):
@@ -0,0 +1,84 @@
+"""
+Gunicorn settings for running the API with several uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Set PROMETHEUS_MULTIPROC_DIR to an empty, writable directory so /metrics
+aggregates samples from every worker.
+
+SG_MODEL_LOAD controls where the sentence encoder is loaded:
+  - "master": loaded once before forking; workers share the weights copy-on-write
+  - "worker": each worker loads its own copy right after fork
+  - "lazy":   loaded on the first /evaluate in each worker
+"""
+import gc
+import logging
+import os
+from env import env
+
+
+logger = logging.getLogger("gunicorn.error")
+
+bind = os.getenv("SG_BIND", "127.0.0.1:8000")
+workers = int(env.WEB_WORKERS)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 300
+graceful_timeout = 30
+
+
+def _torch_threads_per_worker() -> int:
+    if env.TORCH_THREADS:
+        return max(1, int(env.TORCH_THREADS))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _load_encoder():
+    from app.utils.grading.semantic import _get_model
+    _get_model()
+
+
+def on_starting(server):
+    if env.MODEL_LOAD != "master":
+        return
+    try:
+        import torch
+        # Keep the master single-threaded so no intra-op pool exists at fork time.
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    logger.info("Preloading sentence encoder in master (pid %s)", os.getpid())
+    _load_encoder()
+
+
+def when_ready(server):
+    # Move everything allocated so far into the permanent generation so the
+    # garbage collector never touches (and un-shares) those pages in workers.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # The app (and its logging) was imported in the master: give this worker
+    # its own log writer thread and re-attach the uvicorn loggers, whose
+    # handlers UvicornWorker replaced.
+    from app.utils.log_handler import attach_uvicorn_loggers, restart_after_fork
+    restart_after_fork()
+    attach_uvicorn_loggers()
+
+    # OMP_NUM_THREADS would be read too late here: torch (and OpenMP) may
+    # already be initialised in the master. set_num_threads applies anyway.
+    threads = _torch_threads_per_worker()
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        logger.info("Worker %s using %d torch intra-op threads", worker.pid, threads)
+    except ImportError:
+        pass
+    if env.MODEL_LOAD == "worker":
+        _load_encoder()
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
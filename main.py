@@ -1,14 +1,27 @@
-import logging, os
-from logging.handlers import TimedRotatingFileHandler
-from fastapi import FastAPI
+import logging, os, asyncio
+import anyio.to_thread
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.db.prisma_client import PrismaClient
 from app.redis.redis_client import redis_handler
+from app.redis.principal_cache import principal_cache
 from app.api.v1.user.auth.routes.user import router as user_auth_router
 from app.api.v1.user.auth.routes.google_auth import router as google_auth_router
 from app.api.v1.user.info.routes import router as user_info_router
 from app.api.v1.evaluation.routes import router as evaluation_router
+from app.api.v1.admin.routes import router as admin_router
+from app.utils.grading.config import cfg
+from app.utils.grading.warmup import warmup
+from app.utils.memory import start_tracking
+from app.utils.metrics import render_metrics
+from app.utils.profiler import ProfilerMiddleware
+from app.utils.log_handler import attach_uvicorn_loggers, setup_logging, stop_logging
+from app.utils.mail_handler import mail_sender
+from app.utils.error_handler import setup_error_handlers
+from app.utils.rate_limiter import RateLimitMiddleware
+from app.utils.tracing import RequestIdMiddleware, setup_tracing, shutdown_tracing
 from env import env
 
 
@@ -16,62 +29,97 @@ from env import env
 
 LOG_DIR = env.LOG_DIR
 LOG_PATH = os.path.join(LOG_DIR, "app.log")
-LOG_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(request_id)s | %(message)s"
 
 os.makedirs(LOG_DIR, exist_ok=True)
 
-file_handler = TimedRotatingFileHandler(
-    LOG_PATH,
-    when='midnight',
-    interval=1,
-    backupCount=7,
-    encoding='utf-8'
-)
-
-file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-file_handler.setLevel(logging.INFO)
-
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-stream_handler.setLevel(logging.INFO)
-
-logging.basicConfig(
-    level=logging.INFO,
-    handlers=[file_handler, stream_handler]
-)
+# Records are queued and written by a background thread, so logging never
+# does file I/O on the event loop.
+setup_logging(LOG_PATH, LOG_FORMAT, json_output=env.LOG_JSON in ("1", "true", "yes"))
 
 logger = logging.getLogger(__name__)
 
-for logger_name in ("uvicorn", "uvicorn.access", "uvicorn.error"):
-    uvicorn_logger = logging.getLogger(logger_name)
-    uvicorn_logger.addHandler(file_handler)
-    uvicorn_logger.setLevel(logging.INFO)
-    uvicorn_logger.propagate = False
+attach_uvicorn_loggers(logging.INFO)
 
 logger.info("Logging is set up correctly.")
 
+# Opt-in (SG_MEMORY_TRACKING=1); started before any model is loaded or request served.
+start_tracking()
+
 
 # Initialize FastAPI application and include routers
 
+async def run_warmup(_app: FastAPI):
+    logger.info("Warming up grading models")
+    try:
+        result = await anyio.to_thread.run_sync(warmup)
+    except Exception as e:
+        logger.exception("Warmup failed")
+        _app.state.warmup_failed = {"warmup": str(e) or type(e).__name__}
+        return
+    _app.state.warmup = result.timings
+    _app.state.warmup_failed = result.failed
+    if result.failed:
+        # Stay unready so the instance is not sent traffic it cannot grade.
+        logger.error("Warmup failed for %s; not ready", ", ".join(result.failed))
+        return
+    logger.info("Warmup finished: %s", result.timings)
+    _app.state.ready = True
+
+
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
+    _app.state.ready = False
+    _app.state.warmup = {}
+    _app.state.warmup_failed = {}
+
+    # Started per worker: the span exporter thread would not survive a fork.
+    setup_tracing()
+
     logger.info("Starting Prisma client")
     await PrismaClient.get_instance()
 
     logger.info("Starting Redis client")
     client = await redis_handler.get_client()
 
-    logger.info("Flushing Redis database")
-    await client.flushdb()
+    # Only cached users are cleared: the mail outbox lives in the same database.
+    logger.info("Clearing cached user info from Redis")
+    stale = [key async for key in client.scan_iter(match="user_info_*", count=1000)]
+    for start in range(0, len(stale), 1000):
+        await client.delete(*stale[start:start + 1000])
+
+    mail_sender.start()
+
+    # Evicts this worker's cached users when another worker changes them.
+    principal_cache.start()
+
+    if cfg.get("warmup", {}).get("enabled", False):
+        warmup_task = asyncio.create_task(run_warmup(_app))
+    else:
+        warmup_task = None
+        _app.state.ready = True
 
     yield
 
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+
+    await principal_cache.stop()
+    await mail_sender.stop()
+
+    # Imported here so auth-only workers still never load the grading stack.
+    from app.utils.grading.semantic import stop_encoder_service
+    await anyio.to_thread.run_sync(stop_encoder_service)
+
     logger.info("Shutting down Prisma client")
     await PrismaClient.close_connection()
 
     logger.info("Shutting down Redis client")
     await redis_handler.disconnect()
 
+    shutdown_tracing()
+    stop_logging()
+
 app = FastAPI(
     title="SmartGrader Backend",
     description="API for managing all operations",
@@ -79,6 +127,15 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+setup_error_handlers(app)
+
+# Innermost, so a profile covers routing and the handler but not the limiter;
+# a no-op unless the request asks to be profiled.
+app.add_middleware(ProfilerMiddleware)
+
+# Added before CORS so 429 responses still carry the CORS headers.
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "https://smartgrader.online", "http://127.0.0.1:5500"],
@@ -87,13 +144,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it wraps CORS too and every response carries X-Request-ID.
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(user_auth_router, prefix="/api/v1", tags=["User Auth"])
 app.include_router(google_auth_router, prefix="/api/v1", tags=["Google Auth"])
 app.include_router(user_info_router, prefix="/api/v1", tags=["User Info"])
 
 app.include_router(evaluation_router, prefix="/api/v1", tags=["Evaluation"])
 
+app.include_router(admin_router, prefix="/api/v1", tags=["Admin"])
+
 @app.get("/")
 async def root():
     logger.info("Root endpoint accessed")
     return {"message": "Welcome to the API"}
+
+@app.get("/ready")
+async def ready(request: Request):
+    if not request.app.state.ready:
+        failed = request.app.state.warmup_failed
+        if failed:
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"ready": False, "message": "Warmup failed", "failed": failed}
+            )
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"ready": False, "message": "Warming up"}
+        )
+    return {"ready": True, "warmup": request.app.state.warmup}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)